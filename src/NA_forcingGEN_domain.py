@@ -0,0 +1,482 @@
+# Domain helpers for the NA forcing conversion scripts
+# Land-cell indexing, the group-wide land mask and the cached gridID/LATIXY/LONGXY domain shared by the PNetCDF drivers
+
+import os
+import hashlib
+from functools import lru_cache
+import numpy as np
+from mpi4py import MPI
+from pyproj import Transformer
+from pyproj import CRS
+
+# Daymet 1km Lambert Conformal Conic projection of the x/y coordinates
+GEOXY_PROJ_STR = "+proj=lcc +lon_0=-100 +lat_0=42.5 +lat_1=25 +lat_2=60 +x_0=0 +y_0=0 +R=6378137 +f=298.257223563 +units=m +no_defs"
+
+# Source read modes of LandReadPlan
+READ_MODES = ('full', 'bbox', 'varn')
+
+# Names of the cached domain arrays, in the order returned by load_or_build_domain()
+DOMAIN_VARS = ('gridID', 'LATIXY', 'LONGXY')
+
+# Domain slices already loaded by this process, keyed by (domain_key(), start, end)
+_domain_memo = {}
+
+def land_index(field):
+    """
+    Flat (row-major) indices of the land gridcells of a 2D field.
+    Land is every non-NaN cell, matching the NaN ocean fill of the Daymet source.
+
+    Args:
+        field: 2D [y, x] slice of the source variable
+    Returns:
+        Sorted int64 array of flat land indices, which are also the land gridIDs
+    """
+    return np.flatnonzero(~np.isnan(field))
+
+def bcast_land_index(land_idx, comm, root=0):
+    """Broadcast the flat land indices held by root to every rank of comm."""
+    number_landcells = comm.bcast(land_idx.size if comm.Get_rank() == root else None, root=root)
+    if comm.Get_rank() != root:
+        land_idx = np.empty(number_landcells, dtype=np.int64)
+    comm.Bcast(land_idx, root=root)
+    return land_idx
+
+def time_chunks(start_time, count_time, chunk_steps, comm):
+    """
+    Split a rank's [start_time, start_time + count_time) slice into chunks of at
+    most chunk_steps steps. Ranks with fewer chunks than the rest of the group
+    are padded with empty chunks, so every rank makes the same number of
+    collective calls.
+
+    Returns:
+        List of (chunk_start, chunk_count) tuples, identical in length on every rank of comm
+    """
+    n_chunks = -(-count_time // chunk_steps)
+    n_chunks = comm.allreduce(n_chunks, op=MPI.MAX)
+    chunks = []
+    for k in range(n_chunks):
+        offset = min(k * chunk_steps, count_time)
+        chunks.append((start_time + offset, min(chunk_steps, count_time - offset)))
+    return chunks
+
+def split_range(n, parts, index):
+    """(start, count) of block index of n items split into parts near-equal contiguous blocks."""
+    base, remainder = n // parts, n % parts
+    if index < remainder:
+        return index * (base + 1), base + 1
+    return index * base + remainder, base
+
+def process_grid(M, time_steps, landcell_split=1):
+    """
+    Time x landcell process grid of a file group of M ranks. Rank r of the group
+    reads and writes time block r // cell_ranks of land-cell block r % cell_ranks.
+
+    Args:
+        M: Ranks of the file group
+        time_steps: Time steps of the file
+        landcell_split: Land-cell blocks requested, or None for the fewest that give every
+                        rank time steps; rounded down to a divisor of M
+    Returns:
+        (time_ranks, cell_ranks), with time_ranks * cell_ranks == M
+    """
+    divisors = [d for d in range(1, M + 1) if M % d == 0]
+    if landcell_split is None:
+        return next((M // d, d) for d in divisors if M // d <= max(time_steps, 1))
+    cell_ranks = max(d for d in divisors if d <= landcell_split)
+    return M // cell_ranks, cell_ranks
+
+def union_land_index(var, total_cols, total_rows, comm, start_time, count_time, max_memory=None):
+    """
+    Land index as the union over all time of the file group: every cell that
+    is non-NaN in any time step of any rank's slice is land. The slice is
+    scanned in chunks bounded by max_memory, an extra full read of the data.
+    """
+    step_nbytes = total_cols * total_rows * np.dtype(np.float32).itemsize
+    scan_steps = max(count_time, 1) if max_memory is None else max(1, int(max_memory // step_nbytes))
+
+    local_land = np.zeros(total_cols * total_rows, dtype=np.uint8)
+    block = np.empty((min(scan_steps, max(count_time, 1)), total_cols, total_rows), dtype=np.float32)
+    for chunk_start, chunk_count in time_chunks(start_time, count_time, scan_steps, comm):
+        var.get_var_all(start=[chunk_start, 0, 0], count=[chunk_count, total_cols, total_rows], data=block[:chunk_count])
+        for t in range(chunk_count):
+            local_land |= ~np.isnan(block[t].ravel())
+    land = np.empty_like(local_land)
+    comm.Allreduce(local_land, land, op=MPI.MAX)
+    return np.flatnonzero(land)
+
+def extract_landcells(data, land_idx, out=None):
+    """
+    Gather the land gridcells of every time slice of a [time, y, x] block
+    with a single indexed take, without promoting or copying the full block.
+
+    Args:
+        data: Source block of shape (time, y, x)
+        land_idx: Flat land indices from land_index()
+        out: Optional preallocated float32 buffer of shape (time, number_landcells)
+    Returns:
+        The (time, number_landcells) land-only array
+    """
+    n_time = data.shape[0]
+    if out is None:
+        out = np.empty((n_time, land_idx.size), dtype=np.float32)
+    flat = data.reshape(n_time, int(np.prod(data.shape[1:])))
+    np.take(flat, land_idx, axis=1, out=out, mode='clip')
+    return out
+
+class LandReadPlan:
+    """
+    Source read requests that gather the land cells of a [time, y, x] variable.
+      full: the whole [y, x] rectangle
+      bbox: the bounding box of the land cells
+      varn: one request per contiguous row run of land cells (PnetCDF varn API),
+            so only land bytes are read
+    """
+    def __init__(self, land_idx, total_cols, total_rows, read_mode='full'):
+        if read_mode not in READ_MODES:
+            raise ValueError(f"Unknown read mode '{read_mode}', expected one of {READ_MODES}")
+        self.read_mode = read_mode
+        self.land_idx = land_idx
+        self.number_landcells = land_idx.size
+
+        rows = land_idx // total_rows
+        cols = land_idx % total_rows
+        if read_mode == 'full' or land_idx.size == 0:
+            self.y0, self.x0, self.ny, self.nx = 0, 0, total_cols, total_rows
+        else:
+            # land_idx is sorted, so the first and last rows bound the land cells in y
+            self.y0, self.x0 = int(rows[0]), int(cols.min())
+            self.ny, self.nx = int(rows[-1]) - self.y0 + 1, int(cols.max()) - self.x0 + 1
+
+        if read_mode == 'varn':
+            # A run starts wherever the flat index jumps or a new row begins
+            first = np.ones(land_idx.size, dtype=bool)
+            first[1:] = (np.diff(land_idx) != 1) | (cols[1:] == 0)
+            self.run_offsets = np.flatnonzero(first)
+            self.run_counts = np.diff(np.append(self.run_offsets, land_idx.size))
+            self.run_rows = rows[self.run_offsets]
+            self.run_cols = cols[self.run_offsets]
+        elif read_mode == 'full':
+            # Over the whole rectangle the gather indices are the land indices, which may be node-shared
+            self.gather_idx = land_idx
+        else:
+            self.gather_idx = (rows - self.y0) * self.nx + (cols - self.x0)
+
+    def step_nbytes(self):
+        """Bytes of read buffer plus land-only output per time step."""
+        if self.read_mode == 'varn':
+            return 2 * self.number_landcells * np.dtype(np.float32).itemsize
+        return (self.ny * self.nx + self.number_landcells) * np.dtype(np.float32).itemsize
+
+    def read_nbytes(self, count_time):
+        """Bytes of the source variable fetched by a read of count_time time steps."""
+        cells = self.number_landcells if self.read_mode == 'varn' else self.ny * self.nx
+        return count_time * cells * np.dtype(np.float32).itemsize
+
+    def chunk_steps(self, max_memory, count_time):
+        """Time steps per chunk that fit max_memory bytes (None reads the slice at once)."""
+        if max_memory is None:
+            return max(count_time, 1)
+        return max(1, int(max_memory // self.step_nbytes()))
+
+    def buffer(self, count_time):
+        """Read buffer for count_time time steps."""
+        if self.read_mode == 'varn':
+            return np.empty(count_time * self.number_landcells, dtype=np.float32)
+        return np.empty((count_time, self.ny, self.nx), dtype=np.float32)
+
+    def view(self, buf, count_time):
+        """Leading part of a read buffer holding count_time time steps."""
+        if self.read_mode == 'varn':
+            return buf[:count_time * self.number_landcells]
+        return buf[:count_time]
+
+    def request(self, start_time, count_time):
+        """start/count of the single rectangular request (full and bbox modes)."""
+        return [start_time, self.y0, self.x0], [count_time, self.ny, self.nx]
+
+    def varn_requests(self, start_time, count_time):
+        """starts/counts arrays of the row-run requests (varn mode), one row per run."""
+        num = self.run_offsets.size
+        starts = np.column_stack((np.full(num, start_time), self.run_rows, self.run_cols)).astype(np.int64)
+        counts = np.column_stack((np.full(num, count_time), np.ones(num), self.run_counts)).astype(np.int64)
+        return starts, counts
+
+    def get_all(self, var, buf, start_time, count_time):
+        """Collective blocking read of count_time steps into buf; returns the filled view."""
+        data = self.view(buf, count_time)
+        if self.read_mode == 'varn':
+            starts, counts = self.varn_requests(start_time, count_time)
+            var.get_varn_all(data, len(starts), starts, counts)
+        else:
+            start, count = self.request(start_time, count_time)
+            var.get_var_all(start=start, count=count, data=data)
+        return data
+
+    def iget(self, var, buf, start_time, count_time):
+        """Post a nonblocking read of count_time steps into buf; returns the request id."""
+        data = self.view(buf, count_time)
+        if self.read_mode == 'varn':
+            starts, counts = self.varn_requests(start_time, count_time)
+            return var.iget_varn(data, len(starts), starts, counts)
+        start, count = self.request(start_time, count_time)
+        return var.iget_var(start=start, count=count, data=data)
+
+    def extract(self, data, count_time, out=None):
+        """Gather the read buffer into a (count_time, number_landcells) float32 array."""
+        if out is None:
+            out = np.empty((count_time, self.number_landcells), dtype=np.float32)
+        if self.read_mode != 'varn':
+            return extract_landcells(data, self.gather_idx, out=out)
+
+        # varn fills the buffer run after run, each run as a [time, run length] block
+        pos = 0
+        for offset, count in zip(self.run_offsets, self.run_counts):
+            size = count_time * count
+            out[:, offset:offset + count] = data[pos:pos + size].reshape(count_time, count)
+            pos += size
+        return out
+
+def transpose_to_cells(data, chunk_start, block_start, cell_ranges, comm):
+    """
+    Cell-major transpose of a time chunk over the file group with one Alltoallv.
+    Each rank holds the [time, cells] chunk of land cells [block_start, block_start + cells)
+    starting at time chunk_start; rank j receives from every rank the part of that chunk
+    within its own land-cell range cell_ranges[j], laid out [cells, time].
+
+    Args:
+        data: (count_time, count_cells) float32 chunk of this rank
+        chunk_start: First time step of the chunk
+        block_start: First land cell of the chunk
+        cell_ranges: (start, end) land-cell range owned by each rank of comm in the cell-major output
+        comm: MPI communicator of the file group (collective)
+    Returns:
+        (buf, starts, counts): the received data and the starts/counts of the matching
+        put_varn requests on a [nj, ni, time] variable, one per sending rank with data
+    """
+    count_time, count_cells = data.shape
+    chunks = comm.allgather((chunk_start, count_time, block_start, count_cells))
+
+    def overlap(first, n, j):
+        lo, hi = max(first, cell_ranges[j][0]), min(first + n, cell_ranges[j][1])
+        return lo, max(lo, hi)
+
+    # Columns of my chunk owned by each destination, sent time-major
+    send_parts = []
+    for j in range(comm.Get_size()):
+        lo, hi = overlap(block_start, count_cells, j)
+        send_parts.append(np.ascontiguousarray(data[:, lo - block_start:hi - block_start]).ravel())
+    sendbuf = np.concatenate(send_parts)
+
+    # Parts of every rank's chunk within my range
+    recv_parts = []
+    for first_time, n_time, first_cell, n_cells in chunks:
+        lo, hi = overlap(first_cell, n_cells, comm.Get_rank())
+        recv_parts.append((first_time, n_time, lo, hi))
+    recv_counts = [n_time * (hi - lo) for _, n_time, lo, hi in recv_parts]
+    recvbuf = np.empty(sum(recv_counts), dtype=np.float32)
+    comm.Alltoallv([sendbuf, [part.size for part in send_parts], MPI.FLOAT], [recvbuf, recv_counts, MPI.FLOAT])
+
+    # Lay out each received [time, cells] part as [cells, time], one subarray request each
+    buf = np.empty_like(recvbuf)
+    starts, counts = [], []
+    pos = 0
+    for (first_time, n_time, lo, hi), size in zip(recv_parts, recv_counts):
+        if size == 0:
+            continue
+        buf[pos:pos + size] = recvbuf[pos:pos + size].reshape(n_time, hi - lo).T.ravel()
+        starts.append([0, lo, first_time])
+        counts.append([1, hi - lo, n_time])
+        pos += size
+    return (buf, np.array(starts, dtype=np.int64).reshape(-1, 3),
+            np.array(counts, dtype=np.int64).reshape(-1, 3))
+
+@lru_cache(maxsize=None)
+def get_transformer(proj_str=GEOXY_PROJ_STR):
+    """Transformer from the x/y projection to lon/lat, built once per process."""
+    geoxyProj = CRS.from_proj4(proj_str)
+    lonlatProj = CRS.from_epsg(4326)
+    return Transformer.from_proj(geoxyProj, lonlatProj, always_xy=True)
+
+def domain_key(x_dim, y_dim, land_idx, proj_str=GEOXY_PROJ_STR):
+    """Hash identifying a domain by its x/y coordinates, projection and land mask."""
+    mask = np.zeros(x_dim.size * y_dim.size, dtype=bool)
+    mask[land_idx] = True
+
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(x_dim, dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(y_dim, dtype=np.float64).tobytes())
+    h.update(proj_str.encode())
+    h.update(np.packbits(mask).tobytes())
+    return h.hexdigest()
+
+def project_landcells(x_dim, y_dim, land_idx, proj_str=GEOXY_PROJ_STR):
+    """
+    Project only the given land gridcells from x/y to lon/lat.
+
+    Args:
+        x_dim: 1D x coordinates (float64)
+        y_dim: 1D y coordinates (float64)
+        land_idx: Flat land indices to project
+        proj_str: Proj4 string of the x/y coordinates
+    Returns:
+        (lonxy, latxy) float64 arrays aligned with land_idx
+    """
+    total_rows = x_dim.size
+    Txy2lonlat = get_transformer(proj_str)
+    lonxy, latxy = Txy2lonlat.transform(x_dim[land_idx % total_rows], y_dim[land_idx // total_rows])
+    return np.asarray(lonxy, dtype=np.float64), np.asarray(latxy, dtype=np.float64)
+
+def build_domain(x_dim, y_dim, land_idx, proj_str=GEOXY_PROJ_STR):
+    """Compute (gridID, LATIXY, LONGXY) for the given land gridcells only."""
+    lonxy, latxy = project_landcells(x_dim, y_dim, land_idx, proj_str)
+    return land_idx.astype(np.int32), latxy, lonxy
+
+def build_cached_domain(path, x_dim, y_dim, land_idx, start, end, comm, proj_str=GEOXY_PROJ_STR):
+    """
+    Fill a new cache entry in parallel: rank 0 preallocates the memory-mapped
+    arrays, every rank projects and writes only its [start:end) land cells,
+    and rank 0 publishes the entry with an atomic rename.
+    Returns this rank's (grid_ids, latxy, lonxy) slice.
+    """
+    tmp_path = f'{path}.tmp{os.getpid()}' if comm.Get_rank() == 0 else None
+    tmp_path = comm.bcast(tmp_path, root=0)
+    dtypes = (np.int32, np.float64, np.float64)
+    if comm.Get_rank() == 0:
+        os.makedirs(tmp_path, exist_ok=True)
+        for name, dtype in zip(DOMAIN_VARS, dtypes):
+            np.lib.format.open_memmap(os.path.join(tmp_path, name + '.npy'), mode='w+', dtype=dtype, shape=(land_idx.size,))
+    comm.Barrier()
+
+    local_domain = build_domain(x_dim, y_dim, land_idx[start:end], proj_str)
+    for name, arr in zip(DOMAIN_VARS, local_domain):
+        cached = np.load(os.path.join(tmp_path, name + '.npy'), mmap_mode='r+')
+        cached[start:end] = arr
+        cached.flush()
+        del cached
+    comm.Barrier()
+
+    if comm.Get_rank() == 0:
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # Another file group published the same domain first
+            for name in DOMAIN_VARS:
+                os.remove(os.path.join(tmp_path, name + '.npy'))
+            os.rmdir(tmp_path)
+    return local_domain
+
+def load_domain(path):
+    """Memory-map the cached domain arrays stored under path."""
+    return tuple(np.load(os.path.join(path, name + '.npy'), mmap_mode='r') for name in DOMAIN_VARS)
+
+def load_or_build_domain(cache_dir, x_dim, y_dim, land_idx, start, end, comm, proj_str=GEOXY_PROJ_STR):
+    """
+    Land gridIDs, LATIXY and LONGXY of this rank's [start:end) land cells.
+    Each rank projects only the land cells it writes, and only once per dataset:
+    slices are memoized per process, and with a cache directory the full domain
+    is persisted as memory-mappable arrays filled cooperatively by comm on a miss.
+
+    Args:
+        cache_dir: Directory of the on-disk domain cache, or None for in-memory only
+        x_dim: 1D x coordinates (float64)
+        y_dim: 1D y coordinates (float64)
+        land_idx: Flat land indices from land_index()
+        start: First land cell written by this rank
+        end: One past the last land cell written by this rank
+        comm: MPI communicator of the file group (collective when cache_dir is set)
+        proj_str: Proj4 string of the x/y coordinates
+    Returns:
+        (grid_ids, latxy, lonxy) arrays over land cells [start:end)
+    """
+    key = domain_key(x_dim, y_dim, land_idx, proj_str)
+    if (key, start, end) in _domain_memo:
+        return _domain_memo[(key, start, end)]
+
+    if cache_dir is None:
+        domain = build_domain(x_dim, y_dim, land_idx[start:end], proj_str)
+    else:
+        path = os.path.join(cache_dir, 'domain_' + key)
+        # Decide on rank 0 so the whole group takes the same branch
+        cached = comm.bcast(os.path.isdir(path) if comm.Get_rank() == 0 else None, root=0)
+        if cached:
+            domain = tuple(arr[start:end] for arr in load_domain(path))
+        else:
+            if comm.Get_rank() == 0:
+                os.makedirs(cache_dir, exist_ok=True)
+            domain = build_cached_domain(path, x_dim, y_dim, land_idx, start, end, comm, proj_str)
+
+    _domain_memo[(key, start, end)] = domain
+    return domain
+
+def shared_array(node_comm, shape, dtype):
+    """
+    Array in a node-shared MPI window: node rank 0 allocates the memory and
+    every rank of node_comm maps it. Returns (win, array); free with win.Free().
+    """
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize if node_comm.Get_rank() == 0 else 0
+    win = MPI.Win.Allocate_shared(nbytes, dtype.itemsize, comm=node_comm)
+    buf, _ = win.Shared_query(0)
+    return win, np.ndarray(buffer=buf, dtype=dtype, shape=shape)
+
+class NodeDomain:
+    """
+    Land index, gridIDs, LATIXY and LONGXY of the full domain held once per node
+    in MPI shared windows. Node rank 0 computes (or loads from the domain cache)
+    the arrays and the other ranks of the node map them read-only, so a node
+    keeps one copy instead of one per rank. Files whose x/y and land index match
+    use slices of these arrays instead of projecting their own.
+    """
+    def __init__(self, node_comm, x_dim, y_dim, land_idx, cache_dir=None, proj_str=GEOXY_PROJ_STR):
+        """
+        Collective over node_comm; x_dim, y_dim and land_idx are only needed on node rank 0.
+        """
+        leader = node_comm.Get_rank() == 0
+        if leader:
+            key = domain_key(x_dim, y_dim, land_idx, proj_str)
+            path = None if cache_dir is None else os.path.join(cache_dir, 'domain_' + key)
+            if path is not None and os.path.isdir(path):
+                domain = load_domain(path)
+            elif path is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                domain = build_cached_domain(path, x_dim, y_dim, land_idx, 0, land_idx.size, MPI.COMM_SELF, proj_str)
+            else:
+                domain = build_domain(x_dim, y_dim, land_idx, proj_str)
+        self.x_dim, self.y_dim = node_comm.bcast((x_dim, y_dim) if leader else None, root=0)
+        number_landcells = node_comm.bcast(land_idx.size if leader else None, root=0)
+
+        self._wins = []
+        arrays = []
+        for dtype in (np.int64, np.int32, np.float64, np.float64):
+            win, arr = shared_array(node_comm, (number_landcells,), dtype)
+            self._wins.append(win)
+            arrays.append(arr)
+
+        # Node rank 0 stores the arrays between two fences, after which every rank of the node sees them
+        for win in self._wins:
+            win.Fence()
+        if leader:
+            for arr, values in zip(arrays, (land_idx,) + tuple(domain)):
+                arr[:] = values
+        for win in self._wins:
+            win.Fence()
+
+        self.land_idx, self.grid_ids, self.latxy, self.lonxy = arrays
+        for arr in arrays:
+            arr.flags.writeable = False
+
+    def matches(self, x_dim, y_dim, land_idx):
+        """Whether a file's coordinates and land index are those of this domain."""
+        return (np.array_equal(x_dim, self.x_dim) and np.array_equal(y_dim, self.y_dim)
+                and np.array_equal(land_idx, self.land_idx))
+
+    def slice(self, start, end):
+        """(grid_ids, latxy, lonxy) views of land cells [start:end)."""
+        return self.grid_ids[start:end], self.latxy[start:end], self.lonxy[start:end]
+
+    def free(self):
+        """Release the shared windows (collective over the node communicator)."""
+        self.land_idx = self.grid_ids = self.latxy = self.lonxy = None
+        for win in self._wins:
+            win.Free()
+        self._wins = []
@@ -0,0 +1,72 @@
+# MPI-IO and PnetCDF hints for the NA forcing conversion scripts
+# Hints come from the command line (key=value) and/or a JSON hints file, such as the one written by tune_hints.py
+
+import json
+import socket
+
+# Hints worth tuning for this workload: ROMIO collective buffering and data sieving, PnetCDF alignment
+KNOWN_HINTS = ('cb_nodes', 'cb_buffer_size', 'romio_cb_read', 'romio_cb_write', 'romio_ds_read', 'romio_ds_write',
+               'striping_factor', 'striping_unit',
+               'nc_header_align_size', 'nc_var_align_size', 'nc_in_place_swap', 'nc_ibuf_size')
+
+def default_cluster():
+    """Cluster name used to select tuned hints: the host name with trailing node digits removed."""
+    return socket.gethostname().split('.')[0].rstrip('0123456789-_') or socket.gethostname()
+
+def parse_hints(pairs):
+    """{key: value} of a list of 'key=value' strings."""
+    hints = {}
+    for pair in pairs or []:
+        key, sep, value = pair.partition('=')
+        if not sep or not key:
+            raise ValueError(f"Hint '{pair}' is not of the form key=value")
+        hints[key.strip()] = value.strip()
+    return hints
+
+def load_hints_file(path, cluster=None):
+    """
+    Read and write hints of a JSON hints file. The file holds either
+      {"hints": {...}, "read": {...}, "write": {...}}  (hints apply to both, read/write to one side), or
+      {"clusters": {"<cluster>": {"hints": {...}, ...}}}, as written by tune_hints.py,
+    in which case the entry of cluster (default_cluster() if None) is used.
+
+    Returns:
+        (read_hints, write_hints) dicts
+    """
+    with open(path) as fh:
+        data = json.load(fh)
+    if 'clusters' in data:
+        cluster = cluster or default_cluster()
+        if cluster not in data['clusters']:
+            raise ValueError(f"No hints for cluster '{cluster}' in {path}, available: {sorted(data['clusters'])}")
+        data = data['clusters'][cluster]
+    both = {k: str(v) for k, v in data.get('hints', {}).items()}
+    read = {**both, **{k: str(v) for k, v in data.get('read', {}).items()}}
+    write = {**both, **{k: str(v) for k, v in data.get('write', {}).items()}}
+    return read, write
+
+def resolve_hints(hints=None, hints_file=None, cluster=None):
+    """
+    Read and write hints of the command line options: the hints file first, then
+    the key=value hints, which apply to both sides and take precedence.
+    """
+    read, write = load_hints_file(hints_file, cluster) if hints_file else ({}, {})
+    both = parse_hints(hints)
+    return {**read, **both}, {**write, **both}
+
+def make_info(hints):
+    """MPI.Info holding hints, or MPI.INFO_NULL when there are none."""
+    # Imported here so that the tuner driver, which must not initialize MPI, can use this module
+    from mpi4py import MPI
+    if not hints:
+        return MPI.INFO_NULL
+    info = MPI.Info.Create()
+    for key, value in hints.items():
+        info.Set(key, str(value))
+    return info
+
+def free_info(info):
+    """Free an MPI.Info made by make_info."""
+    from mpi4py import MPI
+    if info != MPI.INFO_NULL:
+        info.Free()
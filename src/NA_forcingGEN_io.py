@@ -0,0 +1,146 @@
+# PnetCDF I/O strategies for the NA forcing conversion engine
+# Each strategy maps the engine's reads and writes onto one family of PnetCDF calls
+
+class IOStrategy:
+    """
+    Get/put calls of one PnetCDF I/O strategy.
+    Reads and writes may be left pending; wait_reads()/wait_writes() complete them.
+    Nonblocking strategies let the engine double-buffer its chunk loop.
+    """
+    name = None
+    nonblocking = False
+    read_mode = None  # Source read mode forced by the strategy (None keeps the user's)
+
+    def __init__(self):
+        self.pending_reads = []
+        self.pending_writes = []
+
+    def begin_reads(self, src):
+        """Prepare the source file for the data reads."""
+
+    def begin_writes(self, dst, max_pending_nbytes):
+        """Prepare the output file, after enddef, for at most max_pending_nbytes of pending writes."""
+
+    def read(self, read_plan, var, buf, start_time, count_time):
+        """Read count_time steps of var's land cells into buf."""
+        read_plan.get_all(var, buf, start_time, count_time)
+
+    def write(self, var, data, start, count):
+        """Write data to var at start/count."""
+        var.put_var_all(start=start, count=count, data=data)
+
+    def write_varn(self, var, data, starts, counts):
+        """Write data to var as the len(starts) subarrays starts/counts, filled one after the other."""
+        var.put_varn_all(data, len(starts), starts, counts)
+
+    def wait_reads(self, src):
+        """Complete the pending reads."""
+        self.pending_reads = []
+
+    def wait_writes(self, dst):
+        """Complete the pending writes."""
+        self.pending_writes = []
+
+    def end_reads(self, src):
+        """Finish the data reads before the source is closed."""
+
+    def end_writes(self, dst):
+        """Finish the writes before the output is closed."""
+
+class BlockingCollective(IOStrategy):
+    """Blocking collective get_var_all/put_var_all."""
+    name = 'blocking_collective'
+
+class NonblockingCollective(IOStrategy):
+    """Nonblocking iget_var/iput_var completed with the collective wait_all."""
+    name = 'nonblocking_collective'
+    nonblocking = True
+
+    def read(self, read_plan, var, buf, start_time, count_time):
+        self.pending_reads.append(read_plan.iget(var, buf, start_time, count_time))
+
+    def write(self, var, data, start, count):
+        self.pending_writes.append(var.iput_var(start=start, count=count, data=data))
+
+    def write_varn(self, var, data, starts, counts):
+        self.pending_writes.append(var.iput_varn(data, len(starts), starts, counts))
+
+    def wait_reads(self, src):
+        src.wait_all(requests=self.pending_reads)
+        self.pending_reads = []
+
+    def wait_writes(self, dst):
+        dst.wait_all(requests=self.pending_writes)
+        self.pending_writes = []
+
+class NonblockingIndependent(NonblockingCollective):
+    """Nonblocking iget_var/iput_var in independent data mode, completed with the independent wait."""
+    name = 'nonblocking_independent'
+
+    def begin_reads(self, src):
+        src.begin_indep()
+
+    def begin_writes(self, dst, max_pending_nbytes):
+        dst.begin_indep()
+
+    def wait_reads(self, src):
+        src.wait(requests=self.pending_reads)
+        self.pending_reads = []
+
+    def wait_writes(self, dst):
+        dst.wait(requests=self.pending_writes)
+        self.pending_writes = []
+
+    def end_reads(self, src):
+        src.end_indep()
+
+    def end_writes(self, dst):
+        dst.end_indep()
+
+class BufferedBput(NonblockingCollective):
+    """
+    Buffered bput_var writes: data is copied into a PnetCDF-attached buffer when
+    posted, so output buffers can be reused at once. Reads are nonblocking iget_var.
+    """
+    name = 'buffered_bput'
+
+    def begin_writes(self, dst, max_pending_nbytes):
+        dst.attach_buff(max(int(max_pending_nbytes), 1))
+
+    def write(self, var, data, start, count):
+        self.pending_writes.append(var.bput_var(start=start, count=count, data=data))
+
+    def write_varn(self, var, data, starts, counts):
+        self.pending_writes.append(var.bput_varn(data, len(starts), starts, counts))
+
+    def end_writes(self, dst):
+        dst.detach_buff()
+
+class Varn(IOStrategy):
+    """Blocking collective I/O reading only the land row runs of the source with get_varn_all."""
+    name = 'varn'
+    read_mode = 'varn'
+
+class IndependentWrites(NonblockingIndependent):
+    """
+    Writes of one file group into an output shared with other groups (see
+    AggregateOutput): nonblocking iput_var completed with the independent wait.
+    The output is put in and out of independent data mode by all groups together.
+    """
+    name = 'independent_writes'
+
+    def begin_writes(self, dst, max_pending_nbytes):
+        """The shared output is already in independent data mode."""
+
+    def end_writes(self, dst):
+        """The shared output leaves independent data mode when it is closed."""
+
+# Selectable strategies by name
+IO_STRATEGIES = {strategy.name: strategy for strategy in
+                 (BlockingCollective, NonblockingIndependent, NonblockingCollective, BufferedBput, Varn)}
+
+def get_io_strategy(name):
+    """New instance of the I/O strategy called name."""
+    if name not in IO_STRATEGIES:
+        raise ValueError(f"Unknown I/O strategy '{name}', expected one of {tuple(IO_STRATEGIES)}")
+    return IO_STRATEGIES[name]()
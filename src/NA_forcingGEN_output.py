@@ -0,0 +1,369 @@
+# Output helpers for the NA forcing conversion engine
+# Time units and variable definitions of the 1D output, and aggregate outputs holding several variables or periods
+
+import os
+import numpy as np
+from datetime import datetime
+from mpi4py import MPI
+import pnetcdf as pnc
+
+from NA_forcingGEN_domain import bcast_land_index, split_range, load_or_build_domain
+from NA_forcingGEN_io import IndependentWrites
+
+# Day of year at the start of each month of the 365-day (noleap) calendar
+MDOY = [0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334, 365]
+
+# Reference dates of the output time units
+TIME_REFERENCES = ('month', 'year')
+
+# Periods a yearly output has room for in its 'periods' attribute
+PERIODS_PER_YEAR = 12
+
+def periods_att(periods, width):
+    """
+    Value of the 'periods' global attribute, blank-padded to width characters. Appending a
+    period rewrites the attribute at the same length, so the header does not grow and
+    PnetCDF has no need to move the data of the existing variables.
+    """
+    return ' '.join(periods).ljust(width)
+
+def rebase_time(tunit, data_time, reference='month'):
+    """
+    Time values as days since a new reference date, with the matching units.
+
+    Args:
+        tunit: 'days since ...' units of the source time variable, referenced to a January 1st
+        data_time: Source time values (float64)
+        reference: 'month' for days since the start of each value's month (the monthly outputs),
+                   'year' for days since January 1st of the first value's year, shared by the
+                   months concatenated into a yearly output
+    Returns:
+        (time values, units)
+    """
+    if reference not in TIME_REFERENCES:
+        raise ValueError(f"Unknown time reference '{reference}', expected one of {TIME_REFERENCES}")
+
+    # Process the time units
+    t0 = str(tunit.lower()).strip('days since')
+    t0 = datetime.strptime(t0, '%Y-%m-%d %X')
+
+    # Calculate year, month, day for the time values
+    iyr = t0.year + np.floor(data_time/365.0)
+    data_time0 = datetime.strptime(str(int(iyr[0]))+'-01-01', '%Y-%m-%d')
+    data_time0 = (data_time0-t0).total_seconds()/86400.0
+
+    iday = data_time - data_time0
+    imm = np.zeros_like(iday)
+    if reference == 'year':
+        tunit = tunit.replace(str(t0.year).zfill(4)+'-', str(int(iyr[0])).zfill(4)+'-')
+        return iday, tunit
+
+    for m in range(1, 13):
+        tpts = np.where((iday > MDOY[m-1]) & (iday <= MDOY[m]))
+        if (len(tpts[0]) > 0):
+            imm[tpts] = m
+            iday[tpts] = iday[tpts] - MDOY[m-1]
+
+    # Update time units
+    tunit = tunit.replace(str(t0.year).zfill(4)+'-', str(int(iyr[0])).zfill(4)+'-')
+    tunit = tunit.replace('-'+str(t0.month).zfill(2)+'-', '-'+str(int(imm[0])).zfill(2)+'-')
+    if(tunit.endswith(' 00') and not tunit.endswith(' 00:00:00')):
+        tunit = tunit + ':00:00'
+    return iday, tunit
+
+def source_atts(src, var_names):
+    """
+    Attributes copied to the output from an open source file: {name: {attribute: value}}
+    of each of var_names and of time, lat and lon (empty when absent).
+    """
+    atts = {}
+    for name in tuple(var_names) + ('time', 'lat', 'lon'):
+        if name in src.variables:
+            atts[name] = {attr_name: src.variables[name].get_att(attr_name) for attr_name in src.variables[name].ncattrs()}
+        else:
+            atts[name] = {}
+    return atts
+
+def define_output(dst, title, time_steps, number_landcells, var_names, atts, tunit, layout='time', unlimited=False,
+                  global_atts=None):
+    """
+    Define the dimensions and variables of a 1D output in define mode and end it.
+
+    Args:
+        dst: PnetCDF output file in define mode
+        title: Global title attribute
+        time_steps: Length of the time dimension
+        number_landcells: Length of the ni dimension
+        var_names: Forcing variables to define
+        atts: Source attributes from source_atts()
+        tunit: Units of the output time variable
+        layout: 'time' ([time, nj, ni]) or 'cell' ([nj, ni, time], cell-major)
+        unlimited: Define time as the record (unlimited) dimension, which must then lead every
+                   variable it is a dimension of, so only the 'time' layout is possible
+        global_atts: Further global attributes {name: value}
+    Returns:
+        {name: variable} of gridID, time, LATIXY, LONGXY and the forcing variables
+    """
+    # Add file title attribute
+    dst.put_att('title', title)
+    for attr_name, value in (global_atts or {}).items():
+        dst.put_att(attr_name, value)
+
+    # Define dimensions
+    if unlimited and layout == 'cell':
+        raise ValueError("The record time dimension must come first, the 'cell' layout cannot use it")
+    dst.def_dim('time', -1 if unlimited else time_steps)
+    dst.def_dim('ni', number_landcells)
+    dst.def_dim('nj', 1)
+
+    # Define variables using PNetCDF API
+    var_id = dst.def_var('gridID', pnc.NC_INT, ['nj', 'ni'])
+    var_time = dst.def_var('time', pnc.NC_DOUBLE, ['time'])
+    var_lat = dst.def_var('LATIXY', pnc.NC_DOUBLE, ['nj', 'ni'])
+    var_lon = dst.def_var('LONGXY', pnc.NC_DOUBLE, ['nj', 'ni'])
+    if layout == 'cell':
+        # Cell-major: the time series of a land cell is contiguous in the file
+        dst.put_att('layout', 'cell-major [nj, ni, time]')
+    variables = {'gridID': var_id, 'time': var_time, 'LATIXY': var_lat, 'LONGXY': var_lon}
+    for var_name in var_names:
+        dims = ['nj', 'ni', 'time'] if layout == 'cell' else ['time', 'nj', 'ni']
+        variables[var_name] = dst.def_var(var_name, pnc.NC_FLOAT, dims)
+
+    var_id.put_att('long_name', "gridId in the NA domain")
+    var_id.put_att('decription', "Covers all land and ocean gridcells, with #0 at the upper left corner of the domain")
+    # Copy attributes
+    for var_name in var_names:
+        for attr_name, value in atts[var_name].items():
+            variables[var_name].put_att(attr_name, value)
+
+    for attr_name, value in atts['time'].items():
+        var_time.put_att(attr_name, tunit if attr_name == 'units' else value)
+
+    # Copy lat/lon attributes if they exist
+    for attr_name, value in atts['lat'].items():
+        var_lat.put_att(attr_name, value)
+    for attr_name, value in atts['lon'].items():
+        var_lon.put_att(attr_name, value)
+
+    # End define mode
+    dst.enddef()
+    return variables
+
+def read_source_header(files, var_names, time_steps, info=None, concat=False):
+    """
+    Attributes of every source file and their time values, read by the calling
+    process alone (used by world rank 0 to define an aggregate output).
+
+    Args:
+        files: Source files
+        var_names: Variable of each file
+        time_steps: Time steps converted per file (-1 for all)
+        info: MPI.Info hints of the opens
+        concat: Read the time values of every file (concatenated periods) instead of the first only
+    Returns:
+        (atts, data_times): atts as from source_atts() with the attributes of every
+        variable, and the list of the float64 time values of each file read
+    Raises:
+        ValueError: when the time units of a file differ from those of the first, as the
+                    values of all files are rebased from the first file's units
+    """
+    atts = {}
+    data_times = []
+    for path, var_name in zip(files, var_names):
+        src = pnc.File(filename=path, mode='r', comm=MPI.COMM_SELF, info=info)
+        if not atts:
+            atts = source_atts(src, [var_name])
+        else:
+            file_atts = source_atts(src, [var_name])
+            atts.setdefault(var_name, file_atts[var_name])
+            if file_atts['time'].get('units') != atts['time'].get('units'):
+                src.close()
+                raise ValueError(f"Time units '{file_atts['time'].get('units')}' of {path} differ from "
+                                 f"'{atts['time'].get('units')}' of {files[0]}")
+        if concat or not data_times:
+            total_time = len(src.dimensions['time'])
+            count = total_time if time_steps == -1 else min(time_steps, total_time)
+            data_time = np.zeros(count, dtype=np.float32)
+            src.variables['time'].get_var_all(start=[0], count=[count], data=data_time)
+            data_times.append(data_time.astype(np.float64))
+        src.close()
+    return atts, data_times
+
+def read_output_state(path, info=None):
+    """
+    What an existing concatenated output holds, read by the calling process alone
+    (used by world rank 0 before appending to it).
+
+    Returns:
+        {'periods', 'periods_width', 'numrecs', 'number_landcells', 'tunit', 'variables'}, or
+        {'error': message} when the file was not written with --aggregate year
+    """
+    dst = pnc.File(filename=path, mode='r', comm=MPI.COMM_SELF, info=info)
+    try:
+        if 'periods' not in dst.ncattrs():
+            return {'error': f"{path} has no 'periods' attribute, it was not written with --aggregate year"}
+        periods = str(dst.get_att('periods'))
+        return {'periods': periods.split(), 'periods_width': len(periods), 'numrecs': len(dst.dimensions['time']),
+                'number_landcells': len(dst.dimensions['ni']), 'tunit': dst.variables['time'].get_att('units'),
+                'variables': list(dst.variables)}
+    finally:
+        dst.close()
+
+class AggregateOutput:
+    """
+    One 1D output holding the data of several source files, created collectively
+    by every rank of comm (the world): all variables of a period, or consecutive
+    periods of a variable concatenated along a record time dimension (concat).
+    The time, gridID, LATIXY and LONGXY variables are written once over all ranks;
+    the file then stays in independent data mode while each file group fills its
+    variables with IndependentWrites, and close() is collective again.
+    A concatenated output records its periods in the 'periods' global attribute, padded
+    to leave room for a year of periods (see periods_att); with append, an existing one is reopened and only the periods it lacks are
+    written, as new time records after the existing ones.
+    """
+    def __init__(self, path, files, var_names, title, time_steps, comm, read_land, domain_cache=None,
+                 shared_domain=None, layout='time', info=None, read_info=None, concat=False, periods=None,
+                 append=False):
+        """
+        Args:
+            path: Output file name
+            files: Source files of the variables, in the order of var_names
+            var_names: Forcing variables of the output
+            title: Global title attribute
+            time_steps: Time steps to convert (-1 for all)
+            comm: MPI communicator of all file groups (collective)
+            read_land: Function of a source file returning its (x_dim, y_dim, land_idx), called on
+                       rank 0 for the first file written, so an append takes the mask of a new period
+            domain_cache: Directory of the persistent gridID/LATIXY/LONGXY cache
+            shared_domain: NodeDomain of this node, used when the domain matches
+            layout: 'time' or 'cell', see define_output()
+            info: MPI.Info hints of the output create
+            read_info: MPI.Info hints of rank 0's header reads
+            concat: Concatenate the files in order along a record time dimension, with time
+                    in days since January 1st of the first file's year; the source time units
+                    of all files must be those of the first
+            periods: Period of each file, recorded in the 'periods' attribute of a concatenated output
+            append: Append to an existing concatenated output instead of overwriting it
+        Raises:
+            ValueError: on every rank, when an existing output cannot be appended to, or
+                        when rank 0 cannot read the sources or they are inconsistent
+        """
+        rank, size = comm.Get_rank(), comm.Get_size()
+        self.path = path
+        periods = list(periods) if periods is not None else [''] * len(files)
+
+        # With append, rank 0 looks for an existing output and the periods it holds already
+        state = None
+        if rank == 0 and append and os.path.exists(path):
+            state = read_output_state(path, read_info)
+            if 'error' not in state:
+                missing = sorted(set(var_names) - set(state['variables']))
+                # Records go after the existing ones, so a period older than the last recorded one
+                # would break the time order
+                last = max(state['periods'], default='')
+                earlier = sorted(p for p in periods if p not in state['periods'] and p < last)
+                if missing:
+                    state = {'error': f"{path} has no variable(s) {missing} to append to"}
+                elif earlier:
+                    state = {'error': f"Period(s) {earlier} precede {last}, the last one in {path}, "
+                                      f"and cannot be appended after it"}
+        state = comm.bcast(state, root=0)
+        if state is not None and 'error' in state:
+            raise ValueError(state['error'])
+        if state is not None:
+            new = [i for i, period in enumerate(periods) if period not in state['periods']]
+            files, var_names, periods = [files[i] for i in new], [var_names[i] for i in new], [periods[i] for i in new]
+        self.files = list(files)
+        self.var_names = list(dict.fromkeys(var_names))
+        self.periods = periods
+        self.appended = state is not None
+        self.time_offsets = {}
+        self.time_steps = 0
+        self.dst = None
+        if not files:
+            # Nothing new to write
+            return
+        first_record = state['numrecs'] if state is not None else 0
+
+        # Rank 0 reads the headers and the domain, and shares them so every rank defines the same file
+        header = None
+        if rank == 0:
+            try:
+                land_source = read_land(files[0])
+                atts, data_times = read_source_header(files, var_names, time_steps, read_info, concat)
+            except Exception as e:
+                # Unreadable or inconsistent sources: shared with the other ranks, which raise it too
+                header = (None,) * 6 + (f"{type(e).__name__}: {e}",)
+            else:
+                offsets = np.cumsum([first_record] + [t.size for t in data_times[:-1]]).tolist()
+                data_time, tunit = rebase_time(atts['time']['units'], np.concatenate(data_times), 'year' if concat else 'month')
+                error = None
+                if state is not None and tunit != state['tunit']:
+                    error = f"Time units '{tunit}' of the new periods differ from '{state['tunit']}' of {path}"
+                header = (atts, data_time, tunit, offsets, land_source[0], land_source[1], error)
+        atts, data_time, tunit, offsets, x_dim, y_dim, error = comm.bcast(header, root=0)
+        if error is not None:
+            raise ValueError(error)
+        # Time record of the first step of each file
+        self.time_offsets = dict(zip((os.path.basename(f) for f in files), offsets)) if concat else {}
+        land_idx = bcast_land_index(land_source[2] if rank == 0 else None, comm)
+        if shared_domain is not None and shared_domain.matches(x_dim, y_dim, land_idx):
+            land_idx = shared_domain.land_idx
+        self.land_idx = land_idx
+        self.time_steps = data_time.size
+        number_landcells = land_idx.size
+        start, count = split_range(number_landcells, size, rank)
+
+        if state is not None:
+            if number_landcells != state['number_landcells']:
+                raise ValueError(f"{path} has {state['number_landcells']} land cells, the land mask has {number_landcells}")
+            self.dst = pnc.File(filename=path, mode='a', comm=comm, info=info)
+            self.variables = {name: self.dst.variables[name] for name in ('gridID', 'time') + tuple(self.var_names)}
+
+            # The existing land cells must be those of the land mask: each rank checks its share of gridID
+            grid_ids = np.empty((1, count), dtype=np.int32)
+            self.variables['gridID'].get_var_all(start=[0, start], count=[1, count], data=grid_ids)
+            mismatch = comm.allreduce(int(not np.array_equal(grid_ids[0], land_idx[start:start + count])), op=MPI.SUM)
+            if mismatch:
+                self.dst.close()
+                raise ValueError(f"gridID of {path} does not match the land mask ({mismatch} rank(s) differ)")
+
+            # Record the appended periods in the room left at creation; the coordinates are kept as they are
+            self.dst.redef()
+            self.dst.put_att('periods', periods_att(state['periods'] + periods, state['periods_width']))
+            self.dst.enddef()
+        else:
+            self.dst = pnc.File(filename=path, mode='w', format='NC_64BIT_DATA', comm=comm, info=info)
+            self.variables = define_output(self.dst, title, self.time_steps, number_landcells, self.var_names, atts, tunit,
+                                           layout, unlimited=concat,
+                                           global_atts={'periods': periods_att(periods, PERIODS_PER_YEAR * (max(map(len, periods)) + 1))}
+                                           if concat else None)
+
+            # Coordinates of this rank's share of the land cells over all ranks, projected once per dataset
+            if shared_domain is not None and land_idx is shared_domain.land_idx:
+                grid_id_arr, latxy_arr, lonxy_arr = shared_domain.slice(start, start + count)
+            else:
+                grid_id_arr, latxy_arr, lonxy_arr = load_or_build_domain(domain_cache, x_dim, y_dim, land_idx,
+                                                                         start, start + count, comm)
+            self.variables['LATIXY'].put_var_all(start=[0, start], count=[1, count], data=latxy_arr.reshape(1, -1))
+            self.variables['LONGXY'].put_var_all(start=[0, start], count=[1, count], data=lonxy_arr.reshape(1, -1))
+            self.variables['gridID'].put_var_all(start=[0, start], count=[1, count],
+                                                 data=grid_id_arr.astype(np.int32).reshape(1, -1))
+
+        # Rank 0 writes the time values after the existing records, the other processes join with empty requests
+        n = data_time.size if rank == 0 else 0
+        self.variables['time'].put_var_all(start=[first_record], count=[n], data=data_time[:n])
+
+        # The file groups write their variables independently of each other
+        self.dst.begin_indep()
+        self.strategy = IndependentWrites()
+
+    def time_offset(self, file):
+        """Time record the data of source file starts at."""
+        return self.time_offsets.get(file, 0)
+
+    def close(self):
+        """Leave independent data mode and close the output (collective)."""
+        if self.dst is not None:
+            self.dst.end_indep()
+            self.dst.close()
@@ -0,0 +1,771 @@
+# data_partition module for batch processing
+# based on array_split and function definition - Modified for MxN parallelism with PNetCDF
+# Unified conversion engine shared by the NA_forcingGEN_pnetcdf_*_time.py entry points,
+# with the PnetCDF calls selected by an I/O strategy
+
+import os, sys
+import argparse
+import glob
+import numpy as np
+from datetime import datetime
+
+from NA_forcingGEN_io import IO_STRATEGIES, get_io_strategy
+from NA_forcingGEN_timing import PhaseTimer, reduce_timings, write_timing_json, write_timing_csv, print_timing_summary
+from NA_forcingGEN_hints import KNOWN_HINTS, resolve_hints, make_info, free_info
+from NA_forcingGEN_schedule import SCHEDULES, PLACEMENTS, static_file_range, largest_first, FileQueue, place_groups, group_of_rank, placement_report, plan_groups, fit_landcell_split
+from NA_forcingGEN_output import rebase_time, source_atts, define_output, AggregateOutput
+from NA_forcingGEN_domain import land_index, bcast_land_index, union_land_index, LandReadPlan, READ_MODES, time_chunks, load_or_build_domain, NodeDomain, split_range, process_grid, transpose_to_cells
+
+
+try:
+    from mpi4py import MPI
+    HAS_MPI4PY = True
+except ImportError:
+    HAS_MPI4PY = False
+    print("mpi4py is required for this script")
+    sys.exit(1)
+
+try:
+    import pnetcdf as pnc
+    HAS_PNETCDF = True
+except ImportError:
+    HAS_PNETCDF = False
+    print("pnetcdf-python is required for this script")
+    sys.exit(1)
+
+# Get current date
+current_date = datetime.now()
+# Format date to mmddyyyy
+formatted_date = current_date.strftime('%m-%d-%Y')
+
+class SourceFile:
+    """
+    A source file opened ahead of its conversion, with the reads of its x/y
+    coordinates, of this process's time values and of the land mask slice
+    issued. With a nonblocking strategy the reads are only posted and wait()
+    completes them, so the next file of a group can be opened while the
+    current file's output is still being written.
+    With a landcell split the group is a time x landcell process grid (see
+    process_grid) and the time slice is that of this rank's grid row.
+    """
+    def __init__(self, input_path, file, var_name, time_steps, comm, M, mask_step=0, nonblocking=True, info=None,
+                 landcell_split=1):
+        local_rank = comm.Get_rank()  # Rank within the sub-communicator for this file
+        self.file = file
+        self.var_name = var_name
+        self.nonblocking = nonblocking
+        self.req_read_list = []
+        self.nbytes_read = 0  # Bytes requested by this process's header and mask reads
+
+        # Open the source file (all processes)
+        source_file = os.path.join(input_path, file)
+
+        # Open with PNetCDF
+        self.src = src = pnc.File(filename=source_file, mode='r', comm=comm, info=info)
+
+        if local_rank == 0:
+            print(f"Successfully opened file: {source_file}\n")
+        self.total_rows = len(src.dimensions['x'])
+        self.total_cols = len(src.dimensions['y'])
+        self.total_time = len(src.dimensions['time'])
+
+        # If time_steps is -1, use all time steps
+        if time_steps == -1:
+            time_steps = self.total_time
+        else:
+            time_steps = min(time_steps, self.total_time)
+        self.time_steps = time_steps
+
+        # Place this process in the time x landcell grid of the group
+        self.time_ranks, self.cell_ranks = process_grid(M, time_steps, landcell_split)
+        self.time_rank, self.cell_rank = divmod(local_rank, self.cell_ranks)
+        if local_rank == 0 and self.cell_ranks > 1:
+            print(f"Process grid of {file}: {self.time_ranks} time x {self.cell_ranks} landcell block(s)")
+
+        # Calculate time slice for each process
+        base_time_per_process = time_steps // self.time_ranks
+        time_remainder = time_steps % self.time_ranks
+
+        # Calculate the start and end indices for the current process
+        if self.time_rank < time_remainder:
+            self.local_start_time = self.time_rank * (base_time_per_process + 1)
+            self.local_count_time = base_time_per_process + 1
+        else:
+            self.local_start_time = self.time_rank * base_time_per_process + time_remainder
+            self.local_count_time = base_time_per_process
+
+        # Read x and y dimensions
+        self.x_dim = np.zeros(self.total_rows, dtype=np.float32)
+        self._read(src.variables['x'], self.x_dim)
+        self.y_dim = np.zeros(self.total_cols, dtype=np.float32)
+        self._read(src.variables['y'], self.y_dim)
+
+        # Time handling - each process reads its own time portion
+        self.local_data_time = np.zeros(self.local_count_time, dtype=np.float32)
+        self._read(src.variables['time'], self.local_data_time, [self.local_start_time], [self.local_count_time])
+
+        # Rank 0 reads the land mask slice, the other processes join with empty requests
+        self.mask_field = None
+        if mask_step >= 0:
+            count_step = 1 if local_rank == 0 else 0
+            self.mask_field = np.empty((count_step, self.total_cols, self.total_rows), dtype=np.float32)
+            self._read(src.variables[var_name], self.mask_field,
+                       [min(mask_step, self.total_time - 1), 0, 0], [count_step, self.total_cols, self.total_rows])
+
+    def _read(self, var, data, start=None, count=None):
+        """Post a nonblocking read, or read collectively right away."""
+        self.nbytes_read += data.nbytes
+        if self.nonblocking:
+            self.req_read_list.append(var.iget_var(data=data, start=start, count=count))
+        else:
+            var.get_var_all(data=data, start=start, count=count)
+
+    def wait(self):
+        """Complete the posted header reads."""
+        if self.nonblocking:
+            # Wait for all read requests to complete
+            self.src.wait_all(requests=self.req_read_list)
+            self.req_read_list = []
+
+def parse_filename(file):
+    """Variable name and period of a clmforc.Daymet4.1km.<var>.<period>.nc file name."""
+    parts = os.path.basename(file).split('.')
+    return parts[-3], parts[-2]
+
+def forcing_save_1dNA(input_path, file, var_name, period, time_steps, output_path, comm, M, domain_cache=None, mask_step=0, read_mode='full', max_memory=None, source=None, next_file=None, io_strategy='blocking_collective', timer=None, read_info=None, write_info=None, shared_domain=None,
+                      landcell_split=1, layout='time', output=None):
+    """
+    Convert NetCDF file to PNetCDF format with M processes
+    handling a single file, splitting work along the time dimension, or over a
+    time x landcell process grid when landcell_split is not 1.
+    The PnetCDF calls of the data path are chosen by the I/O strategy.
+
+    Args:
+        input_path: Path to input files
+        file: Name of the file to process
+        var_name: Variable name
+        period: Period string
+        time_steps: Number of timesteps to process (-1 for all)
+        output_path: Path for output files
+        comm: MPI communicator for this file's M processes
+        M: Number of processes for this file
+        domain_cache: Directory of the persistent gridID/LATIXY/LONGXY cache (None keeps it in memory)
+        mask_step: Time step the land mask is read from, or -1 for the union over all time
+        read_mode: Source read mode, 'full', 'bbox' (land bounding box) or 'varn' (land row runs)
+        max_memory: Per-process budget in bytes for the streamed time chunks (None processes the slice at once)
+        source: SourceFile of this file opened ahead by the previous call (None opens it here)
+        next_file: Callable returning the name of the group's next file (or None), opened before this output is closed
+        io_strategy: Name of the I/O strategy, one of IO_STRATEGIES
+        timer: PhaseTimer the wall-clock time of each phase is recorded in (None uses a private one)
+        read_info: MPI.Info hints of the source opens (None for none)
+        write_info: MPI.Info hints of the output create (None for none)
+        shared_domain: NodeDomain of this node, used instead of a private domain when the file matches it
+        landcell_split: Land-cell blocks of the process grid, or None to split land cells only as far
+                        as needed to give every rank time steps (see process_grid)
+        layout: Output layout of the variable, 'time' ([time, nj, ni]) or 'cell' ([nj, ni, time], cell-major,
+                transposed over the group with Alltoallv so each rank writes whole time series of its cells)
+        output: AggregateOutput the variable is written into, which holds the land index, time and
+                coordinates (None creates this file's own output)
+    Returns:
+        The SourceFile of the next file, or None
+    Raises:
+        ValueError: on every rank of comm, when the land mask of the file differs from that of output
+    """
+    strategy = get_io_strategy(io_strategy)
+    if strategy.read_mode is not None:
+        read_mode = strategy.read_mode
+    # Writes into a shared output are independent of the other file groups
+    writer = strategy if output is None else output.strategy
+
+    # Wall-clock phase timing of this file on this rank
+    if timer is None:
+        timer = PhaseTimer()
+    timer.begin_file(file)
+
+    local_rank = comm.Get_rank()  # Rank within the sub-communicator for this file
+
+    # Open the source file (all processes), unless it was opened ahead by the previous file
+    if source is None:
+        with timer.phase('open'):
+            source = SourceFile(input_path, file, var_name, time_steps, comm, M, mask_step, strategy.nonblocking, read_info,
+                                landcell_split)
+    with timer.phase('read'):
+        source.wait()
+    timer.add_bytes('read', source.nbytes_read)
+    src = source.src
+    total_rows, total_cols = source.total_rows, source.total_cols
+    time_steps_arg = time_steps
+    time_steps = source.time_steps
+    local_start_time, local_count_time = source.local_start_time, source.local_count_time
+    # Ranks of a grid row share the time slice; its first rank stands for the row where only time matters
+    row_count_time = local_count_time if source.cell_rank == 0 else 0
+
+    x_dim = source.x_dim.astype(np.float64)
+    y_dim = source.y_dim.astype(np.float64)
+
+    local_data_time = source.local_data_time.astype(np.float64)
+
+    # Get time unit attribute
+    tunit = src.variables['time'].get_att('units')
+
+    # Create the land mask once per file group as a flat land gridcell index and share it,
+    # so every process agrees on number_landcells before the collective def_dim
+    with timer.phase('mask'):
+        if output is not None:
+            # The shared output is laid out on the land mask of its first file; a variable
+            # with another NaN pattern would be extracted at the wrong cells
+            land_idx = output.land_idx
+            matches = np.array_equal(land_index(source.mask_field[0]), land_idx) if local_rank == 0 else None
+            if not comm.bcast(matches, root=0):
+                raise ValueError(f"The land mask of {file} differs from that of {os.path.basename(output.path)}")
+        elif mask_step < 0:
+            land_idx = union_land_index(src.variables[var_name], total_cols, total_rows, comm, local_start_time, row_count_time, max_memory)
+            timer.add_bytes('mask', row_count_time * total_cols * total_rows * np.dtype(np.float32).itemsize)
+        else:
+            land_idx = bcast_land_index(land_index(source.mask_field[0]) if local_rank == 0 else None, comm)
+        # Drop this rank's copy of the land index for the node-shared one when the domain matches
+        use_shared = output is None and shared_domain is not None and shared_domain.matches(x_dim, y_dim, land_idx)
+        if use_shared:
+            land_idx = shared_domain.land_idx
+        number_landcells = land_idx.size
+
+        # This process's block of land cells in the process grid; blocks are contiguous in the
+        # flat index, so a block spans a band of rows and its bounding box is read rather than
+        # the full rectangle
+        block_start, block_count = split_range(number_landcells, source.cell_ranks, source.cell_rank)
+        block_read_mode = 'bbox' if read_mode == 'full' and source.cell_ranks > 1 else read_mode
+
+        # Reads skip ocean cells as the read mode allows
+        read_plan = LandReadPlan(land_idx[block_start:block_start + block_count], total_cols, total_rows, block_read_mode)
+
+    # Time as days since the start of the month. Ranks beyond the time steps have no values to
+    # rebase, so the units come from group rank 0, which always has time steps
+    if local_count_time > 0:
+        local_data_time, tunit = rebase_time(tunit, local_data_time, 'month')
+    tunit = comm.bcast(tunit, root=0)
+
+    # Calculate landcells slice for each process
+    base_lancells_per_process = number_landcells // M
+    landcells_remainder = number_landcells % M
+
+    # Calculate the start and end indices for the current process
+    if local_rank < landcells_remainder:
+        local_start_landcells = local_rank * (base_lancells_per_process + 1)
+        local_count_landcells = base_lancells_per_process + 1
+    else:
+        local_start_landcells = local_rank * base_lancells_per_process + landcells_remainder
+        local_count_landcells = base_lancells_per_process
+
+    local_end_landcells = local_start_landcells + local_count_landcells
+
+    # Land cells of every process in the cell-major layout, the same partition as the coordinates
+    cell_ranges = [(start, start + count) for start, count in (split_range(number_landcells, M, j) for j in range(M))]
+
+    if output is not None:
+        # The shared output is defined and holds the coordinates already; concatenated
+        # periods start at their own time record
+        dst, var_main = output.dst, output.variables[var_name]
+        time_offset = output.time_offset(file)
+    else:
+        # Land gridIDs (row-major flat indices, #0 at the upper left corner of the domain) and lat/lon
+        # of the land cells this process writes, projected once per dataset and reused afterwards
+        with timer.phase('projection'):
+            if use_shared:
+                grid_id_arr, latxy_arr, lonxy_arr = shared_domain.slice(local_start_landcells, local_end_landcells)
+            else:
+                grid_id_arr, latxy_arr, lonxy_arr = load_or_build_domain(domain_cache, x_dim, y_dim, land_idx,
+                                                                         local_start_landcells, local_end_landcells, comm)
+
+        # Create output filename
+        dst_name = os.path.join(output_path, f'clmforc.Daymet4.1km.p1d.{var_name}.{period}.1step1process.nc')
+
+        # Create the output file with PNetCDF
+        with timer.phase('open'):
+            dst = pnc.File(filename=dst_name, mode='w', format='NC_64BIT_DATA', comm=comm, info=write_info)
+        with timer.phase('define'):
+            variables = define_output(dst, var_name + '('+period+') created from '+ input_path +' on ' + formatted_date,
+                                      time_steps, number_landcells, [var_name], source_atts(src, [var_name]), tunit, layout)
+        var_main = variables[var_name]
+        time_offset = 0
+
+    # Stream my time slice in chunks bounded by max_memory. Nonblocking strategies run a
+    # double-buffered pipeline: the read of chunk k+1 and the write of chunk k-1 are pending
+    # while chunk k is extracted, so two chunks are in flight and each gets half of the budget.
+    # The writer of a shared output is nonblocking whatever the strategy, so its output
+    # buffers are doubled on their own: chunk k is extracted while chunk k-1 is pending
+    pipelined = strategy.nonblocking
+    double_buffered = pipelined or writer.nonblocking
+    chunk_memory = None if max_memory is None else (max_memory // 2 if double_buffered else max_memory)
+    chunk_steps = read_plan.chunk_steps(chunk_memory, local_count_time)
+    chunks = time_chunks(local_start_time, local_count_time, chunk_steps, comm)
+    n_read_bufs = min(len(chunks), 2 if pipelined else 1)
+    n_out_bufs = min(len(chunks), 2 if writer.nonblocking else 1)
+    read_bufs = [read_plan.buffer(chunk_steps) for _ in range(n_read_bufs)]
+    out_bufs = [np.empty((chunk_steps, block_count), dtype=np.float32) for _ in range(n_out_bufs)]
+    cell_bufs = [None] * n_out_bufs  # Transposed chunks of the cell-major layout, kept until their write completes
+
+    # At most one chunk and the coordinate slices are pending at once
+    chunk_nbytes = chunk_steps * block_count * 4
+    if layout == 'cell':
+        # A transposed chunk holds my cells of at most one chunk of every grid row
+        chunk_nbytes = comm.allreduce(chunk_steps, op=MPI.MAX) * source.time_ranks * local_count_landcells * 4
+    max_pending_nbytes = chunk_nbytes + row_count_time * 8 + local_count_landcells * (8 + 8 + 4)
+    with timer.phase('define'):
+        strategy.begin_reads(src)
+        writer.begin_writes(dst, max_pending_nbytes)
+
+    # Prime the loop with the first chunk
+    with timer.phase('read'):
+        if chunks:
+            strategy.read(read_plan, src.variables[var_name], read_bufs[0], *chunks[0])
+            timer.add_bytes('read', read_plan.read_nbytes(chunks[0][1]))
+        strategy.wait_reads(src)
+
+    for k, (chunk_start, chunk_count) in enumerate(chunks):
+        has_next = k + 1 < len(chunks)
+
+        # Post the read of chunk k+1 into the other buffer
+        if pipelined and has_next:
+            with timer.phase('read'):
+                strategy.read(read_plan, src.variables[var_name], read_bufs[(k + 1) % n_read_bufs], *chunks[k + 1])
+                timer.add_bytes('read', read_plan.read_nbytes(chunks[k + 1][1]))
+
+        # extract chunk k over land gridcells into its preallocated float32 buffer
+        with timer.phase('extract'):
+            local_data = read_plan.view(read_bufs[k % n_read_bufs], chunk_count)
+            chunk_data_arr = read_plan.extract(local_data, chunk_count, out=out_bufs[k % n_out_bufs][:chunk_count])
+
+        # Flush chunk k-1, which frees its output buffer, then write chunk k
+        if layout == 'cell':
+            # Exchange the chunk so each process holds its own cells' part of every rank's chunk
+            with timer.phase('transpose'):
+                cell_data, starts, counts = transpose_to_cells(chunk_data_arr, time_offset + chunk_start, block_start, cell_ranges, comm)
+            with timer.phase('write'):
+                writer.wait_writes(dst)
+                cell_bufs[k % n_out_bufs] = cell_data
+                writer.write_varn(var_main, cell_data, starts, counts)
+                timer.add_bytes('write', cell_data.nbytes)
+        else:
+            with timer.phase('write'):
+                writer.wait_writes(dst)
+                start_var = [time_offset + chunk_start, 0, block_start]
+                count_var = [chunk_count, 1, block_count]
+                writer.write(var_main, chunk_data_arr.reshape(chunk_count, 1, block_count), start_var, count_var)
+                timer.add_bytes('write', chunk_data_arr.nbytes)
+
+        # Read (blocking strategies) or complete (pipelined strategies) chunk k+1
+        with timer.phase('read'):
+            if not pipelined and has_next:
+                strategy.read(read_plan, src.variables[var_name], read_bufs[0], *chunks[k + 1])
+                timer.add_bytes('read', read_plan.read_nbytes(chunks[k + 1][1]))
+            strategy.wait_reads(src)
+    strategy.end_reads(src)
+
+    # The last chunk's write is completed together with the coordinates, which a shared output holds already
+    if output is None:
+        timer.start('write')
+
+        # Write time data, once per grid row
+        start_time = [local_start_time]
+        count_time = [row_count_time]
+        writer.write(variables['time'], local_data_time[:row_count_time], start_time, count_time)
+
+        # Write lat/lon data
+        writer.write(variables['LATIXY'], latxy_arr.reshape(1, -1), [0, local_start_landcells], [1, local_count_landcells])
+
+        writer.write(variables['LONGXY'], lonxy_arr.reshape(1, -1), [0, local_start_landcells], [1, local_count_landcells])
+
+        writer.write(variables['gridID'], grid_id_arr.reshape(1, -1), [0, local_start_landcells], [1, local_count_landcells])
+        # gridID is stored as NC_INT whatever the in-memory integer type
+        timer.add_bytes('write', row_count_time * local_data_time.itemsize + latxy_arr.nbytes + lonxy_arr.nbytes
+                        + grid_id_arr.size * np.dtype(np.int32).itemsize)
+        timer.stop('write')
+
+    # Open the next file of the group and issue its reads while this output is completed and closed.
+    # The open is charged to this file, whose output is still pending
+    next_source = None
+    next_name = next_file() if next_file is not None else None
+    if next_name is not None:
+        next_var_name, _ = parse_filename(next_name)
+        with timer.phase('open'):
+            next_source = SourceFile(input_path, next_name, next_var_name, time_steps_arg, comm, M, mask_step,
+                                     strategy.nonblocking, read_info, landcell_split)
+
+    # Wait for all write operations to complete
+    with timer.phase('write'):
+        writer.wait_writes(dst)
+        writer.end_writes(dst)
+
+    # Close files; a shared output is closed by all file groups together
+    with timer.phase('close'):
+        src.close()
+        if output is None:
+            dst.close()
+    timer.end_file()
+
+    if local_rank == 0:
+        print(f"Successfully processed {file}\n")
+        print(f"File {file}: Read time = {timer.current['read']:.2f}s, Write time = {timer.current['write']:.2f}s, "
+              f"Read {timer.current['read_bytes'] / 1e6:.1f} MB, Written {timer.current['write_bytes'] / 1e6:.1f} MB (rank 0)")
+
+    return next_source
+
+def read_domain_source(path, mask_step=0, info=None):
+    """
+    x/y coordinates and land index of one source file, read by a single process
+    (used by the node leaders to set up the node-shared domain).
+
+    Returns:
+        (x_dim, y_dim, land_idx), coordinates as float64
+    """
+    var_name, _ = parse_filename(path)
+    src = pnc.File(filename=path, mode='r', comm=MPI.COMM_SELF, info=info)
+    total_rows = len(src.dimensions['x'])
+    total_cols = len(src.dimensions['y'])
+    total_time = len(src.dimensions['time'])
+    x_dim = np.zeros(total_rows, dtype=np.float32)
+    src.variables['x'].get_var_all(data=x_dim)
+    y_dim = np.zeros(total_cols, dtype=np.float32)
+    src.variables['y'].get_var_all(data=y_dim)
+    field = np.empty((1, total_cols, total_rows), dtype=np.float32)
+    src.variables[var_name].get_var_all(start=[min(mask_step, total_time - 1), 0, 0], count=[1, total_cols, total_rows], data=field)
+    src.close()
+    return x_dim.astype(np.float64), y_dim.astype(np.float64), land_index(field[0])
+
+def get_files(input_path, ncheader='clmforc'):
+    """Get the list of NetCDF files to process."""
+    print(input_path + ncheader)
+    files = glob.glob("%s*.%s" % (input_path + ncheader, 'nc'))
+    files.sort()
+    print("Total " + str(len(files)) + " files need to be processed")
+    return files
+
+def group_by_output(files, aggregate='period'):
+    """
+    Source files of each aggregate output, in output order: {period: files} of all
+    variables of a period ('period'), or {(variable, year): files} of the periods
+    of a variable's year in time order ('year').
+    """
+    outputs = {}
+    for f in sorted(files):
+        var_name, period = parse_filename(os.path.basename(f))
+        key = period if aggregate == 'period' else (var_name, period.split('-')[0])
+        outputs.setdefault(key, []).append(f)
+    return dict(sorted(outputs.items()))
+
+def auto_int(value):
+    """argparse type of a positive integer or 'auto' (None)."""
+    if value == 'auto':
+        return None
+    if int(value) < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer or 'auto', got {value}")
+    return int(value)
+
+def plan_file_groups(files_nc, world_size, time_steps, max_memory, M, N, group_sizes=None, landcell_split=1):
+    """
+    Group sizes of the run, planned on the calling rank from the first file's time
+    length and the mean file size (see plan_groups), unless given explicitly.
+
+    Returns:
+        (group_sizes, reason, landcell_split)
+    """
+    if group_sizes:
+        if min(group_sizes) < 1:
+            raise ValueError(f"--group_sizes must all be positive, got {list(group_sizes)}")
+        if sum(group_sizes) != world_size:
+            raise ValueError(f"--group_sizes add up to {sum(group_sizes)}, not to the {world_size} MPI processes")
+    total_time, file_nbytes = 1, 0
+    if files_nc:
+        src = pnc.File(filename=files_nc[0], mode='r', comm=MPI.COMM_SELF)
+        total_time = len(src.dimensions['time'])
+        src.close()
+        file_nbytes = sum(os.path.getsize(f) for f in files_nc) / len(files_nc)
+    steps = total_time if time_steps == -1 else min(time_steps, total_time)
+    if group_sizes:
+        return fit_landcell_split(list(group_sizes), 'group sizes given', steps, landcell_split)
+    return plan_groups(world_size, len(files_nc), steps, file_nbytes, max_memory, M, N, landcell_split=landcell_split)
+
+def main(default_strategy='blocking_collective'):
+    parser = argparse.ArgumentParser(
+        description="The code converts NetCDF to Parallel NetCDF with MxN parallelism and selectable PnetCDF I/O strategies")
+    parser.add_argument('input_path', help="path to the 2D source data directory")
+    parser.add_argument('output_path', help="path for the 1D forcing data directory")
+    parser.add_argument('time_steps', type=int, help="timesteps to be processed or -1 (all time series)")
+    # M processes will handle a single file, splitting work along the time dimension
+    parser.add_argument('M', type=auto_int, help="Number of processes per file (time dimension splitting), or auto")
+    # N files will be processed in parallel, each with M processes, for a total of M*N processes
+    parser.add_argument('N', type=auto_int, help="Number of files to process simultaneously, or auto")
+    parser.add_argument('--group_sizes', type=int, nargs='+', default=None,
+                        help="explicit (possibly uneven) number of processes of each file group, overriding M and N")
+    parser.add_argument('--io_strategy', choices=tuple(IO_STRATEGIES), default=default_strategy,
+                        help=f"PnetCDF I/O strategy of the data path (default {default_strategy})")
+    parser.add_argument('--domain_cache', default=None,
+                        help="directory of the persistent gridID/LATIXY/LONGXY cache, reused across files and runs")
+    parser.add_argument('--mask_step', type=int, default=0,
+                        help="time step the land mask is read from, or -1 for the union over all processed time steps")
+    parser.add_argument('--read_mode', choices=READ_MODES, default='full',
+                        help="read the full [y, x] rectangle, the land bounding box, or only land row runs with varn requests")
+    parser.add_argument('--max_memory', type=float, default=None,
+                        help="per-process memory budget in MB; the time slice is streamed in chunks that fit it")
+    parser.add_argument('--schedule', choices=SCHEDULES, default='static',
+                        help="static: contiguous blocks of files per group; dynamic: groups take the next file (largest first) as they free up")
+    parser.add_argument('--placement', choices=PLACEMENTS, default='rank',
+                        help="rank: groups of consecutive world ranks; node: pack each group onto as few nodes as possible, spread evenly over the nodes")
+    parser.add_argument('--timing_json', default=None,
+                        help="write the per-rank phase timings and their group/world statistics to this JSON file")
+    parser.add_argument('--hints', nargs='+', default=None, metavar='KEY=VALUE',
+                        help="MPI-IO/PnetCDF hints for the source opens and output creates, e.g. cb_buffer_size=16777216 romio_cb_write=enable")
+    parser.add_argument('--hints_file', default=None,
+                        help="JSON hints file ({hints, read, write} or the per-cluster file of tune_hints.py); --hints take precedence")
+    parser.add_argument('--shared_domain', action='store_true',
+                        help="hold the land index, gridID, LATIXY and LONGXY once per node in MPI shared memory, set up from the first file")
+    parser.add_argument('--hints_cluster', default=None,
+                        help="cluster entry of a tune_hints.py hints file (default: this host name without node digits)")
+    parser.add_argument('--timing_csv', default=None,
+                        help="write the group/world phase timing statistics to this CSV file")
+    parser.add_argument('--layout', choices=('time', 'cell'), default='time',
+                        help="output layout: time-major [time, nj, ni], or cell-major [nj, ni, time] built with an Alltoallv transpose "
+                             "so per-cell time series are contiguous")
+    parser.add_argument('--aggregate', choices=('none', 'period', 'year'), default='none',
+                        help="none: one output per source file; period: one output per period holding all its variables; "
+                             "year: one output per variable and year, the months concatenated along a record time dimension. "
+                             "Coordinates are written once and the file groups fill the output in parallel")
+    parser.add_argument('--append', action='store_true',
+                        help="with --aggregate year, add only the months missing from existing yearly outputs as new time records, "
+                             "after checking their gridID against the land mask")
+    parser.add_argument('--landcell_split', type=auto_int, default=1,
+                        help="split each file group into a time x landcell grid of this many land-cell blocks (a divisor of the group size), "
+                             "or auto for as few blocks as give every rank time steps")
+    args = parser.parse_args()
+
+    input_path = args.input_path
+    if not input_path.endswith('/'): input_path = input_path + '/'
+
+    output_path = args.output_path
+    if not output_path.endswith('/'): output_path = output_path + '/'
+
+    time_steps = args.time_steps
+    M = args.M  # Processes per file
+    N = args.N  # Files in parallel
+    max_memory = None if args.max_memory is None else int(args.max_memory * 1024 * 1024)
+
+    # Initialize MPI
+    if not HAS_MPI4PY:
+        print("mpi4py is required for this script")
+        sys.exit(1)
+
+    if not HAS_PNETCDF:
+        print("pnetcdf-python is required for this script")
+        sys.exit(1)
+
+    world_comm = MPI.COMM_WORLD
+    world_size = world_comm.Get_size()
+    world_rank = world_comm.Get_rank()
+
+    # Get list of files to process
+    files_nc = get_files(input_path)
+    n_files = len(files_nc)
+
+    # Determine which files to process
+    # We want to split the world communicator into N groups of (about) M processes each,
+    # with whatever is left 'auto' planned on rank 0 for any world size
+    plan = None
+    if world_rank == 0:
+        try:
+            plan = plan_file_groups(files_nc, world_size, time_steps, max_memory, M, N, args.group_sizes, args.landcell_split)
+        except ValueError as e:
+            plan = (None, str(e), None)
+    group_sizes, plan_reason, args.landcell_split = world_comm.bcast(plan, root=0)
+    if group_sizes is None:
+        if world_rank == 0:
+            print(f"Error: {plan_reason}")
+        sys.exit(1)
+    N = len(group_sizes)
+    if world_rank == 0:
+        print(f"Plan: {N} file group(s) of {group_sizes} processes for {n_files} file(s) ({plan_reason})")
+
+    # Calculate group ID and rank within group
+    groups = place_groups(world_comm, group_sizes, args.placement)
+    file_group, group_rank = group_of_rank(groups, world_rank)
+    M = len(groups[file_group])  # Processes of this file group
+
+    # Create communicators for each file group
+    file_comm = world_comm.Split(file_group, group_rank)
+
+    # Report which groups run on which node
+    node_assignment = placement_report(world_comm, groups)
+    if world_rank == 0:
+        print(f"Placement '{args.placement}':")
+        for node, node_groups in sorted(node_assignment.items()):
+            assignment = ', '.join(f'group {g} ({n} ranks)' for g, n in sorted(node_groups.items()))
+            print(f"  {node}: {assignment}")
+        straddling = [g for g in range(N) if sum(g in node_groups for node_groups in node_assignment.values()) > 1]
+        if straddling:
+            print(f"  groups spanning several nodes: {straddling}")
+    print(f'Group {file_group} Local_rank {group_rank}')
+
+    if args.schedule == 'dynamic' and args.aggregate != 'none':
+        if world_rank == 0:
+            print("Warning: --schedule dynamic is ignored with --aggregate, the source files of each output are dealt to the groups")
+        args.schedule = 'static'
+    if args.schedule == 'dynamic':
+        # Groups that free up take the next file from a shared counter, largest files first
+        files_nc = largest_first(files_nc, world_comm)
+        file_queue = FileQueue(world_comm, file_comm)
+
+        def next_file():
+            file_idx = file_queue.next_index()
+            return os.path.basename(files_nc[file_idx]) if file_idx < n_files else None
+    else:
+        start_file_idx, end_file_idx = static_file_range(n_files, N, file_group)
+        group_files = iter([os.path.basename(f) for f in files_nc[start_file_idx:end_file_idx]])
+
+        def next_file():
+            return next(group_files, None)
+
+    if args.aggregate != 'none' and args.mask_step < 0:
+        if world_rank == 0:
+            print("Error: --aggregate needs a land mask common to all variables, not --mask_step -1")
+        sys.exit(1)
+    if args.append and args.aggregate != 'year':
+        if world_rank == 0:
+            print("Error: --append needs --aggregate year")
+        sys.exit(1)
+    if args.aggregate == 'year' and args.layout == 'cell':
+        if world_rank == 0:
+            print("Error: --aggregate year writes time as the record dimension, which the cell-major layout cannot have")
+        sys.exit(1)
+
+    # MPI-IO/PnetCDF hints of the source opens and output creates
+    read_hints, write_hints = resolve_hints(args.hints, args.hints_file, args.hints_cluster)
+    if world_rank == 0:
+        unknown = sorted((set(read_hints) | set(write_hints)) - set(KNOWN_HINTS))
+        if unknown:
+            print(f"Warning: hints {unknown} are not among the tuned hints and are passed through as is")
+        print(f"Read hints: {read_hints}, write hints: {write_hints}")
+    read_info, write_info = make_info(read_hints), make_info(write_hints)
+
+    # One rank per node sets up the full domain from the first file in node-shared memory;
+    # every file with the same coordinates and land mask then uses it instead of a private copy
+    shared_domain = None
+    if args.shared_domain and files_nc:
+        if args.mask_step < 0:
+            if world_rank == 0:
+                print("Warning: --shared_domain is ignored with --mask_step -1, the land mask differs per file group")
+        else:
+            node_comm = world_comm.Split_type(MPI.COMM_TYPE_SHARED)
+            node_domain_source = None
+            if node_comm.Get_rank() == 0:
+                node_domain_source = read_domain_source(files_nc[0], args.mask_step, read_info)
+            shared_domain = NodeDomain(node_comm, *(node_domain_source or (None, None, None)), args.domain_cache)
+            n_nodes = world_comm.allreduce(1 if node_comm.Get_rank() == 0 else 0)
+            if world_rank == 0:
+                print(f"Node-shared domain: {shared_domain.land_idx.size} land cells on {n_nodes} node(s)")
+
+    # Wall-clock time of every phase on this rank, reduced over the groups and the world at the end
+    timer = PhaseTimer(file_group, group_rank)
+
+    def convert_files(next_file, output=None):
+        """Process each file assigned to this group, opening each next file before the current output is closed."""
+        source = None
+        f = next_file()
+        while f is not None:
+            # Extract variable name and period from the filename
+            var_name, period = parse_filename(f)
+
+            if group_rank == 0:
+                print(f'Group {file_group} processing {var_name} ({period}) in the file {f}')
+
+            start_time = MPI.Wtime()
+
+            # Process the file with the file_comm
+            try:
+                source = forcing_save_1dNA(input_path, f, var_name, period, time_steps, output_path, file_comm, M,
+                                           args.domain_cache, args.mask_step, args.read_mode, max_memory,
+                                           source=source, next_file=next_file, io_strategy=args.io_strategy, timer=timer,
+                                           read_info=read_info, write_info=write_info, shared_domain=shared_domain,
+                                           landcell_split=args.landcell_split, layout=args.layout, output=output)
+            except ValueError as e:
+                # Only this group knows; the other groups wait in collectives over the shared output
+                if group_rank == 0:
+                    print(f"Error: {e}")
+                sys.stdout.flush()
+                world_comm.Abort(1)
+
+            end_time = MPI.Wtime()
+
+            if group_rank == 0:
+                print(f"Group {file_group}: Processing {f} took {end_time - start_time:.2f} seconds")
+
+            f = source.file if source is not None else None
+
+    if args.aggregate != 'none':
+        # One output per period (all variables) or per variable and year (all months), created
+        # by all ranks; its source files are dealt to the file groups, which fill it at the same time
+        for key, output_files in group_by_output(files_nc, args.aggregate).items():
+            var_names = [parse_filename(os.path.basename(f))[0] for f in output_files]
+            periods = [parse_filename(os.path.basename(f))[1] for f in output_files]
+            if args.aggregate == 'period':
+                name, label = key, ', '.join(var_names) + ' ('+key+')'
+            else:
+                name, label = f'{key[0]}.{key[1]}', key[0] + ' ('+periods[0]+' to '+periods[-1]+')'
+            try:
+                output = AggregateOutput(os.path.join(output_path, f'clmforc.Daymet4.1km.p1d.{name}.1step1process.nc'),
+                                         output_files, var_names, label + ' created from '+ input_path +' on ' + formatted_date,
+                                         time_steps, world_comm, lambda path: read_domain_source(path, args.mask_step, read_info),
+                                         args.domain_cache, shared_domain, args.layout, write_info, read_info, concat=args.aggregate == 'year', periods=periods,
+                                         append=args.append)
+            except ValueError as e:
+                # Raised on every rank alike
+                if world_rank == 0:
+                    print(f"Error: {e}")
+                sys.exit(1)
+            if not output.files:
+                if world_rank == 0:
+                    print(f"{output.path} holds {', '.join(periods)} already, skipped")
+                continue
+            # With append, only the periods missing from the output are dealt
+            group_files = iter([os.path.basename(f) for i, f in enumerate(output.files) if i % N == file_group])
+            convert_files(lambda: next(group_files, None), output)
+            output.close()
+            if world_rank == 0:
+                action = 'Appended ' + ', '.join(output.periods) + ' to' if output.appended else 'Wrote'
+                print(f"{action} {output.path} from {len(output.files)} source file(s), {output.time_steps} time step(s)")
+    else:
+        convert_files(next_file)
+
+    if args.schedule == 'dynamic':
+        file_queue.free()
+    free_info(read_info)
+    free_info(write_info)
+    if shared_domain is not None:
+        shared_domain.free()
+        node_comm.Free()
+
+    # Cleanup
+    file_comm.Free()
+
+    # Wait for all processes to finish
+    world_comm.Barrier()
+
+    # Reduce the phase timings; the max over ranks is the straggler that sets the job time
+    report = reduce_timings(timer, world_comm)
+    if world_rank == 0:
+        print_timing_summary(report)
+        config = {'M': args.M or 'auto', 'N': args.N or 'auto', 'group_sizes': group_sizes, 'time_steps': time_steps, 'io_strategy': args.io_strategy,
+                  'read_mode': args.read_mode, 'mask_step': args.mask_step, 'max_memory': max_memory,
+                  'schedule': args.schedule, 'n_files': n_files,
+                  'read_hints': read_hints, 'write_hints': write_hints,
+                  'placement': args.placement, 'groups': groups,
+                  'landcell_split': args.landcell_split or 'auto', 'layout': args.layout,
+                  'aggregate': args.aggregate, 'append': args.append}
+        if args.timing_json:
+            write_timing_json(report, args.timing_json, config)
+        if args.timing_csv:
+            write_timing_csv(report, args.timing_csv)
+
+    if world_rank == 0:
+        print("All files have been processed successfully")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+# Scheduling helpers for the NA forcing conversion scripts
+# Placement of the file groups on the nodes and distribution of the source files over the groups
+
+import os
+import numpy as np
+from mpi4py import MPI
+
+from NA_forcingGEN_domain import process_grid
+
+# File scheduling policies of the conversion scripts
+SCHEDULES = ('static', 'dynamic')
+
+# Placement policies of the file groups: by launch order, or packed onto nodes
+PLACEMENTS = ('rank', 'node')
+
+def get_node_rank(comm):
+    """Get the node-local rank for the current process."""
+    # Get the processor name (node identifier)
+    proc_name = MPI.Get_processor_name()
+
+    # Gather all processor names to rank 0
+    all_proc_names = comm.allgather(proc_name)
+
+    # Create a dictionary mapping node names to node ranks
+    node_dict = {}
+    node_rank = 0
+    for name in all_proc_names:
+        if name not in node_dict:
+            node_dict[name] = node_rank
+            node_rank += 1
+
+    # Get the node rank for the current process
+    return node_dict[proc_name]
+
+def pack_groups(rank_nodes, group_sizes):
+    """
+    Assign world ranks to file groups node by node. Each group goes whole onto the
+    node with the most free ranks that can hold it, which packs groups onto single
+    nodes and spreads them evenly over the nodes. A group that fits on no node takes
+    the largest free blocks first, so it straddles as few nodes as possible.
+
+    Args:
+        rank_nodes: Node index of every world rank
+        group_sizes: Number of ranks of each group
+    Returns:
+        List of the sorted world ranks of each group
+    """
+    free = {}
+    for rank, node in enumerate(rank_nodes):
+        free.setdefault(node, []).append(rank)
+
+    groups = []
+    for size in group_sizes:
+        members = []
+        while len(members) < size:
+            need = size - len(members)
+            fits = [node for node in free if len(free[node]) >= need]
+            node = max(fits or free, key=lambda n: (len(free[n]), -n))
+            members += free[node][:need]
+            free[node] = free[node][need:]
+            if not free[node]:
+                del free[node]
+        groups.append(sorted(members))
+    return groups
+
+def place_groups(world_comm, group_sizes, placement='rank'):
+    """
+    World ranks of every file group under a placement policy.
+      rank: consecutive world ranks, by launch order
+      node: packed onto nodes by pack_groups(), from the node of every rank (get_node_rank)
+
+    Returns:
+        List of the sorted world ranks of each group, identical on every rank
+    """
+    if placement == 'node':
+        rank_nodes = world_comm.allgather(get_node_rank(world_comm))
+        return pack_groups(rank_nodes, group_sizes)
+    groups, start = [], 0
+    for size in group_sizes:
+        groups.append(list(range(start, start + size)))
+        start += size
+    return groups
+
+def group_of_rank(groups, world_rank):
+    """(file_group, group_rank) of a world rank in the group placement."""
+    for file_group, members in enumerate(groups):
+        if world_rank in members:
+            return file_group, members.index(world_rank)
+    raise ValueError(f"World rank {world_rank} is in no file group")
+
+def placement_report(world_comm, groups):
+    """
+    Per-node group assignment, gathered on world rank 0.
+
+    Returns:
+        On world rank 0, {node name: {file_group: number of its ranks on the node}}, None elsewhere
+    """
+    names = world_comm.gather(MPI.Get_processor_name(), root=0)
+    if world_comm.Get_rank() != 0:
+        return None
+    report = {}
+    for file_group, members in enumerate(groups):
+        for rank in members:
+            node = report.setdefault(names[rank], {})
+            node[file_group] = node.get(file_group, 0) + 1
+    return report
+
+def static_file_range(n_files, N, file_group):
+    """
+    Contiguous block of files assigned to a file group, handling uneven division.
+
+    Returns:
+        (start_file_idx, end_file_idx) of the group's files
+    """
+    # Calculate file distribution among groups, handling uneven division
+    base_files_per_group = n_files // N  # Integer division
+    remainder = n_files % N
+
+    # Calculate start and end indices for files to be processed by this group
+    # First 'remainder' groups get (base_files_per_group + 1) files
+    # Remaining groups get base_files_per_group files
+    if file_group < remainder:
+        start_file_idx = file_group * (base_files_per_group + 1)
+        end_file_idx = start_file_idx + base_files_per_group + 1
+    else:
+        start_file_idx = (remainder * (base_files_per_group + 1)) + ((file_group - remainder) * base_files_per_group)
+        end_file_idx = start_file_idx + base_files_per_group
+    # Safety check to ensure we don't exceed the number of files
+    end_file_idx = min(end_file_idx, n_files)
+    return start_file_idx, end_file_idx
+
+def largest_first(files, comm):
+    """Files ordered by decreasing size, decided on rank 0 so every rank sees the same order."""
+    order = None
+    if comm.Get_rank() == 0:
+        order = sorted(files, key=lambda f: (-os.path.getsize(f), f))
+    return comm.bcast(order, root=0)
+
+class FileQueue:
+    """
+    Dynamic work queue shared by all file groups. The queue is an MPI counter
+    exposed by world rank 0; the leader of a group that frees up takes the next
+    file index with an atomic Fetch_and_op and broadcasts it to its group.
+    """
+    def __init__(self, world_comm, file_comm):
+        self.file_comm = file_comm
+        itemsize = MPI.INT64_T.Get_size()
+        self.win = MPI.Win.Allocate(itemsize if world_comm.Get_rank() == 0 else 0, itemsize, comm=world_comm)
+        if world_comm.Get_rank() == 0:
+            self.win.Lock(0)
+            self.win.Put(np.zeros(1, dtype=np.int64), 0)
+            self.win.Unlock(0)
+        world_comm.Barrier()
+
+    def next_index(self):
+        """Next unclaimed file index, identical on every rank of the group (collective over file_comm)."""
+        idx = None
+        if self.file_comm.Get_rank() == 0:
+            one = np.ones(1, dtype=np.int64)
+            result = np.zeros(1, dtype=np.int64)
+            self.win.Lock(0, MPI.LOCK_SHARED)
+            self.win.Fetch_and_op(one, result, 0, 0, MPI.SUM)
+            self.win.Unlock(0)
+            idx = int(result[0])
+        return self.file_comm.bcast(idx, root=0)
+
+    def free(self):
+        """Release the counter window (collective over the world communicator)."""
+        self.win.Free()
+
+def split_ranks(world_size, n_groups):
+    """Sizes of n_groups groups sharing world_size ranks as evenly as possible (larger groups first)."""
+    base, remainder = divmod(world_size, n_groups)
+    return [base + 1 if g < remainder else base for g in range(n_groups)]
+
+def plan_groups(world_size, n_files, time_steps, file_nbytes, max_memory=None, M=None, N=None, tolerance=0.05,
+                landcell_split=1):
+    """
+    Group sizes for any world size. M and N fixed by the user are kept; what is left
+    'auto' (None) is chosen from the number of files, their time length and size, and
+    the memory budget, using the model: makespan ~ waves of files x file size / ranks
+    per group, with at most time_steps x landcell_split useful ranks per group. Among the plans within
+    tolerance of the best makespan the one with the most groups is taken, since smaller
+    groups exchange less data in collective I/O.
+
+    Args:
+        world_size: Number of MPI processes
+        n_files: Number of files to convert
+        time_steps: Time steps converted per file (ranks beyond this get no time steps)
+        file_nbytes: Bytes of a source file
+        max_memory: Per-process memory budget in bytes; groups are made large enough for
+                    a rank's slice to fit it when possible (None for no constraint)
+        M: Ranks per group fixed by the user, or None
+        N: Number of groups fixed by the user, or None
+        landcell_split: Land-cell blocks per group (see process_grid), or None when every rank is useful
+    Returns:
+        (group_sizes, reason, landcell_split), the list of ranks per group, a description of
+        the plan and the landcell split to use (see fit_landcell_split)
+    Raises:
+        ValueError: when M and N do not fit world_size
+    """
+    if M is not None and N is not None:
+        if M * N != world_size:
+            raise ValueError(f"Total MPI processes ({world_size}) must equal M*N ({M}*{N}={M*N})")
+        return fit_landcell_split([M] * N, 'M and N given', time_steps, landcell_split)
+    if M is not None:
+        if M > world_size:
+            raise ValueError(f"M={M} processes per file exceed the {world_size} MPI processes")
+        # The ranks left over after N groups of M are given to the first groups
+        n_groups = world_size // M
+        sizes = split_ranks(world_size, n_groups)
+        reason = f'M={M} given, {n_groups} group(s) from {world_size} ranks'
+        if sizes[0] != M:
+            reason += f', the leftover ranks make groups of up to {sizes[0]}'
+        return fit_landcell_split(sizes, reason, time_steps, landcell_split)
+    if N is not None:
+        if N > world_size:
+            raise ValueError(f"N={N} file groups exceed the {world_size} MPI processes")
+        return fit_landcell_split(split_ranks(world_size, N), f'N={N} given', time_steps, landcell_split)
+
+    time_steps = max(time_steps, 1)
+    useful = world_size if landcell_split is None else time_steps * landcell_split
+    min_m = 1 if not max_memory else min(world_size, -(-int(file_nbytes) // int(max_memory)))
+    plans = []
+    for n_groups in range(1, min(max(n_files, 1), world_size) + 1):
+        sizes = split_ranks(world_size, n_groups)
+        if sizes[-1] < min_m:
+            continue
+        waves = -(-max(n_files, 1) // n_groups)
+        plans.append((waves * file_nbytes / min(sizes[-1], useful), n_groups, sizes))
+    if not plans:
+        return fit_landcell_split([world_size], f'one group: the memory budget needs {min_m} ranks per file',
+                                  time_steps, landcell_split)
+    best = min(p[0] for p in plans)
+    cost, n_groups, sizes = max((p for p in plans if p[0] <= best * (1 + tolerance)), key=lambda p: p[1])
+    reason = (f'{n_groups} group(s) for {n_files} file(s) of {time_steps} time steps, '
+              f'{-(-max(n_files, 1) // n_groups)} wave(s)' + (f', at least {min_m} ranks per file for the memory budget' if min_m > 1 else ''))
+    return fit_landcell_split(sizes, reason, time_steps, landcell_split)
+
+def fit_landcell_split(sizes, reason, time_steps, landcell_split=1):
+    """
+    Landcell split that gives every rank of groups of the given sizes time steps. The split
+    each group actually runs is rounded down to a divisor of its size (see process_grid), so
+    a split that leaves a group with more time blocks than time steps is replaced by 'auto' (None).
+
+    Returns:
+        (sizes, reason, landcell_split), the reason noting a change of the split
+    """
+    if landcell_split is None:
+        return sizes, reason, landcell_split
+    short = sorted({m for m in sizes if process_grid(m, time_steps, landcell_split)[0] > max(time_steps, 1)})
+    if short:
+        reason += (f'; with --landcell_split {landcell_split} groups of {", ".join(map(str, short))} ranks have more time blocks '
+                   f'than the {time_steps} time step(s) per file, so land cells are split as needed (--landcell_split auto)')
+        landcell_split = None
+    return sizes, reason, landcell_split
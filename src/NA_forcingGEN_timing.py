@@ -0,0 +1,180 @@
+# Timing instrumentation for the NA forcing conversion engine
+# Wall-clock (MPI.Wtime) time of each conversion phase on every rank, reduced per file group and world,
+# and the bytes moved by the I/O phases with the bandwidth they achieved
+
+import csv
+import json
+from contextlib import contextmanager
+import numpy as np
+from mpi4py import MPI
+
+# Conversion phases, in the order they first occur for a file
+PHASES = ('open', 'read', 'mask', 'projection', 'define', 'extract', 'transpose', 'write', 'close')
+
+# Phases whose bytes are counted; bandwidth is bytes over the phase time
+IO_PHASES = ('read', 'mask', 'write')
+
+# Time imbalance above which a run is reported as imbalanced rather than I/O- or compute-bound
+IMBALANCE_THRESHOLD = 0.2
+
+class PhaseTimer:
+    """
+    Per-rank wall-clock timer of the conversion phases.
+    Time is accumulated per file; a phase may be entered many times per file
+    (e.g. once per time chunk). Elapsed time includes time blocked in MPI-IO.
+    """
+    def __init__(self, group=0, group_rank=0):
+        self.group = group
+        self.group_rank = group_rank
+        self.records = []
+        self.current = None
+        self._phase_start = {}
+
+    def begin_file(self, file):
+        """Start the record of file; phases are charged to it until the next begin_file."""
+        self.current = {'file': file, 'total': 0.0}
+        self.current.update({phase: 0.0 for phase in PHASES})
+        self.current.update({phase + '_bytes': 0 for phase in IO_PHASES})
+        self.records.append(self.current)
+        self._file_start = MPI.Wtime()
+
+    def end_file(self):
+        """Close the record of the current file with its wall-clock total."""
+        self.current['total'] = MPI.Wtime() - self._file_start
+
+    def start(self, name):
+        """Start timing phase name."""
+        self._phase_start[name] = MPI.Wtime()
+
+    def stop(self, name):
+        """Charge the time since start(name) to phase name of the current file."""
+        elapsed = MPI.Wtime() - self._phase_start.pop(name)
+        if self.current is not None:
+            self.current[name] += elapsed
+        return elapsed
+
+    @contextmanager
+    def phase(self, name):
+        """Charge the wall-clock time of the with-block to phase name of the current file."""
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def add_bytes(self, name, nbytes):
+        """Count nbytes moved by this rank in I/O phase name of the current file."""
+        if self.current is not None:
+            self.current[name + '_bytes'] += int(nbytes)
+
+    def totals(self):
+        """Time of each phase and in total, and bytes of each I/O phase, summed over this rank's files."""
+        keys = PHASES + ('total',) + tuple(phase + '_bytes' for phase in IO_PHASES)
+        return {key: sum(r[key] for r in self.records) for key in keys}
+
+def phase_stats(values):
+    """
+    min/max/mean of per-rank times and the load imbalance max/mean - 1,
+    the fraction of time the slowest rank adds over a balanced run.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return {'min': 0.0, 'max': 0.0, 'mean': 0.0, 'imbalance': 0.0}
+    mean = values.mean()
+    return {'min': float(values.min()), 'max': float(values.max()), 'mean': float(mean),
+            'imbalance': float(values.max() / mean - 1.0) if mean > 0 else 0.0}
+
+def bandwidth_stats(members):
+    """
+    Bytes of each I/O phase summed over the ranks and the bandwidth achieved in GB/s.
+    The ranks run concurrently, so the bytes are divided by the slowest rank's phase time.
+    """
+    stats = {}
+    for phase in IO_PHASES:
+        nbytes = sum(r['totals'][phase + '_bytes'] for r in members)
+        seconds = max((r['totals'][phase] for r in members), default=0.0)
+        stats[phase] = {'bytes': nbytes, 'seconds': seconds,
+                        'gbps': nbytes / seconds / 1e9 if seconds > 0 else 0.0}
+    return stats
+
+def classify(stats):
+    """
+    Whether a group or world is 'imbalanced' (total time imbalance above IMBALANCE_THRESHOLD),
+    'io-bound' (I/O phases take most of the mean time) or 'compute-bound'.
+    """
+    if stats['total']['imbalance'] > IMBALANCE_THRESHOLD:
+        return 'imbalanced'
+    io = sum(stats[phase]['mean'] for phase in ('open', 'read', 'mask', 'write', 'close'))
+    compute = sum(stats[phase]['mean'] for phase in ('projection', 'define', 'extract'))
+    return 'io-bound' if io >= compute else 'compute-bound'
+
+def reduce_timings(timer, comm, root=0):
+    """
+    Gather every rank's records to root and reduce them per file group and over the world.
+
+    Returns:
+        On root, a dict with the per-rank records and the 'groups'/'world' statistics, None elsewhere
+    """
+    rank_record = {'world_rank': comm.Get_rank(), 'group': timer.group, 'group_rank': timer.group_rank,
+                   'processor': MPI.Get_processor_name(), 'totals': timer.totals(), 'files': timer.records}
+    ranks = comm.gather(rank_record, root=root)
+    if comm.Get_rank() != root:
+        return None
+
+    # Achieved bandwidth of every rank
+    for r in ranks:
+        r['gbps'] = {phase: r['totals'][phase + '_bytes'] / r['totals'][phase] / 1e9 if r['totals'][phase] > 0 else 0.0
+                     for phase in IO_PHASES}
+
+    keys = PHASES + ('total',)
+    groups, group_bandwidth, group_bound = {}, {}, {}
+    for group in sorted(set(r['group'] for r in ranks)):
+        members = [r for r in ranks if r['group'] == group]
+        groups[str(group)] = {key: phase_stats([r['totals'][key] for r in members]) for key in keys}
+        group_bandwidth[str(group)] = bandwidth_stats(members)
+        group_bound[str(group)] = classify(groups[str(group)])
+    world = {key: phase_stats([r['totals'][key] for r in ranks]) for key in keys}
+    return {'world_size': len(ranks), 'ranks': ranks, 'groups': groups, 'world': world,
+            'bandwidth': {'groups': group_bandwidth, 'world': bandwidth_stats(ranks)},
+            'bound': {'groups': group_bound, 'world': classify(world)}}
+
+def stats_rows(report):
+    """
+    Flat rows (scope, group, phase, min, max, mean, imbalance, bytes, gbps) of a reduced report;
+    bytes and gbps are only set for the I/O phases.
+    """
+    rows = []
+    scopes = [('group', group, stats, report['bandwidth']['groups'][group]) for group, stats in report['groups'].items()]
+    scopes.append(('world', '', report['world'], report['bandwidth']['world']))
+    for scope, group, stats, bandwidth in scopes:
+        for phase, s in stats.items():
+            io = bandwidth.get(phase, {'bytes': '', 'gbps': ''})
+            rows.append({'scope': scope, 'group': group, 'phase': phase, **s,
+                         'bytes': io['bytes'], 'gbps': io['gbps']})
+    return rows
+
+def write_timing_json(report, path, config=None):
+    """Write the reduced report and the run configuration as JSON."""
+    with open(path, 'w') as fh:
+        json.dump({'config': config or {}, **report}, fh, indent=2)
+
+def write_timing_csv(report, path):
+    """Write the group and world statistics as CSV."""
+    with open(path, 'w', newline='') as fh:
+        writer = csv.DictWriter(fh, fieldnames=['scope', 'group', 'phase', 'min', 'max', 'mean',
+                                                'imbalance', 'bytes', 'gbps'])
+        writer.writeheader()
+        writer.writerows(stats_rows(report))
+
+def print_timing_summary(report):
+    """Print the world statistics of every phase and the achieved bandwidth per group and world."""
+    print(f"{'phase':<12}{'min':>10}{'max':>10}{'mean':>10}{'imbalance':>11}")
+    for phase, s in report['world'].items():
+        print(f"{phase:<12}{s['min']:>10.3f}{s['max']:>10.3f}{s['mean']:>10.3f}{s['imbalance']:>10.1%}")
+
+    print(f"{'scope':<12}" + ''.join(f"{phase + ' GB/s':>14}" for phase in IO_PHASES) + f"{'bound':>15}")
+    scopes = [(f'group {group}', bandwidth, report['bound']['groups'][group])
+              for group, bandwidth in report['bandwidth']['groups'].items()]
+    scopes.append(('world', report['bandwidth']['world'], report['bound']['world']))
+    for scope, bandwidth, bound in scopes:
+        print(f"{scope:<12}" + ''.join(f"{bandwidth[phase]['gbps']:>14.3f}" for phase in IO_PHASES) + f"{bound:>15}")
@@ -0,0 +1,392 @@
+# Analysis of the NA forcing benchmark results
+# Strong-scaling speedup and efficiency, read/write share, trial-to-trial variance with t confidence
+# intervals and outlier detection, from the legacy benchmark.sh CSVs and the benchmark.py results
+
+import os, sys
+import argparse
+import csv
+import json
+import math
+import random
+import statistics
+from collections import defaultdict
+from itertools import combinations
+
+# Timings analyzed for every configuration
+METRICS = ('read_time', 'write_time', 'total_time')
+
+# Fields of a trial record that are not timings
+RECORD_KEYS = ('label', 'processes', 'M', 'N', 'time_steps', 'trial')
+
+def _float(value):
+    """float of a CSV field, None when empty or unparsable."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _label(script, strategy):
+    """Name of a benchmarked variant: the script, and the I/O strategy unless it is the script's default."""
+    script = os.path.basename(script)
+    return script if strategy in (None, '', 'default') else f'{script}:{strategy}'
+
+def load_results(path):
+    """
+    Trial records of a results file: a legacy benchmark.sh CSV, a benchmark.py CSV or a benchmark.py JSON.
+    Rows without timings (failed runs, warning lines) are skipped.
+
+    Returns:
+        (records, skipped), records as dicts with label, processes, M, N, time_steps, trial and METRICS
+    """
+    records, skipped = [], 0
+    if path.endswith('.json'):
+        with open(path) as fh:
+            rows = json.load(fh)['runs']
+    else:
+        with open(path, newline='') as fh:
+            rows = list(csv.DictReader(fh))
+
+    for row in rows:
+        if 'File' in row:
+            # Legacy File,Processes,Trial,ReadTime,WriteTime,TotalTime rows; benchmark.sh ran one file group (N=1) with all time steps
+            record = {'label': _label(row['File'], None), 'processes': _float(row['Processes']), 'N': 1,
+                      'time_steps': -1, 'trial': _float(row.get('Trial')),
+                      'read_time': _float(row['ReadTime']), 'write_time': _float(row['WriteTime']),
+                      'total_time': _float(row['TotalTime'])}
+            record['M'] = record['processes']
+        else:
+            if row.get('status', 'ok') != 'ok':
+                skipped += 1
+                continue
+            record = {'label': _label(row['script'], row.get('io_strategy')), 'processes': _float(row['processes']),
+                      'M': _float(row['M']), 'N': _float(row['N']), 'time_steps': _float(row['time_steps']),
+                      'trial': _float(row.get('trial'))}
+            record.update({metric: _float(row.get(metric)) for metric in METRICS})
+            # benchmark.py JSON runs carry the full timing report: keep the slowest rank's other phases
+            for phase, stats in row.get('timing', {}).get('world', {}).items():
+                if f'{phase}_time' not in METRICS:
+                    record[f'{phase}_time'] = stats['max']
+        if record['processes'] is None or any(record[metric] is None for metric in METRICS):
+            skipped += 1
+            continue
+        for key in ('processes', 'M', 'N', 'time_steps', 'trial'):
+            record[key] = int(record[key]) if record[key] is not None else None
+        records.append(record)
+    return records, skipped
+
+def group_records(records):
+    """Records grouped by configuration (label, time_steps, processes, M, N)."""
+    groups = defaultdict(list)
+    for r in records:
+        groups[(r['label'], r['time_steps'], r['processes'], r['M'], r['N'])].append(r)
+    return dict(sorted(groups.items()))
+
+def _betacf(a, b, x):
+    """Continued fraction of the regularized incomplete beta function (modified Lentz)."""
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        for num in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                    -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + num * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + num / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-14:
+            break
+    return h
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1.0 - x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+def t_cdf(t, df):
+    """Student t cumulative distribution function."""
+    tail = 0.5 * _betainc(df / 2.0, 0.5, df / (df + t * t))
+    return 1.0 - tail if t >= 0 else tail
+
+def t_quantile(p, df):
+    """Student t quantile, by bisection of t_cdf."""
+    lo, hi = -1e3, 1e3
+    for _ in range(200):
+        mid = 0.5 * (lo + hi)
+        if t_cdf(mid, df) < p:
+            lo = mid
+        else:
+            hi = mid
+    return 0.5 * (lo + hi)
+
+def quartiles(values):
+    """First and third quartiles (linear interpolation)."""
+    if len(values) < 2:
+        return values[0], values[0]
+    q = statistics.quantiles(values, n=4, method='inclusive')
+    return q[0], q[2]
+
+def outliers(values, iqr_k=1.5, mad_z=3.5):
+    """
+    Indices of outlying trials by the IQR fences (outside [Q1 - k IQR, Q3 + k IQR])
+    and by the MAD modified z-score (0.6745 |x - median| / MAD above mad_z).
+    """
+    q1, q3 = quartiles(values)
+    iqr = q3 - q1
+    iqr_idx = [i for i, v in enumerate(values) if v < q1 - iqr_k * iqr or v > q3 + iqr_k * iqr]
+    median = statistics.median(values)
+    mad = statistics.median([abs(v - median) for v in values])
+    mad_idx = [i for i, v in enumerate(values) if mad > 0 and 0.6745 * abs(v - median) / mad > mad_z]
+    return {'iqr': iqr_idx, 'mad': mad_idx}
+
+def describe(values, confidence=0.95):
+    """n, mean, median, standard deviation, coefficient of variation, t confidence interval and outliers."""
+    n = len(values)
+    mean = statistics.fmean(values)
+    std = statistics.stdev(values) if n > 1 else 0.0
+    half = t_quantile(0.5 + confidence / 2.0, n - 1) * std / math.sqrt(n) if n > 1 else 0.0
+    return {'n': n, 'mean': mean, 'median': statistics.median(values), 'std': std,
+            'cv': std / mean if mean else 0.0, 'ci_low': mean - half, 'ci_high': mean + half,
+            'min': min(values), 'max': max(values), 'outliers': outliers(values)}
+
+def analyze(records, confidence=0.95):
+    """
+    Per-configuration statistics and strong-scaling figures.
+    Speedup is relative to the fewest processes of the same label and time steps,
+    efficiency is speedup over the process ratio.
+
+    Returns:
+        List of configuration dicts, ordered by label, time steps and processes
+    """
+    configs = []
+    for (label, time_steps, processes, M, N), rows in group_records(records).items():
+        config = {'label': label, 'time_steps': time_steps, 'processes': processes, 'M': M, 'N': N,
+                  'trials': [r['trial'] for r in rows]}
+        for metric in METRICS:
+            config[metric] = describe([r[metric] for r in rows], confidence)
+        total = config['total_time']['mean']
+        config['read_share'] = config['read_time']['mean'] / total if total else 0.0
+        config['write_share'] = config['write_time']['mean'] / total if total else 0.0
+        configs.append(config)
+
+    # Strong scaling against the smallest process count of each curve
+    base = {}
+    for c in configs:
+        key = (c['label'], c['time_steps'])
+        if key not in base or c['processes'] < base[key]['processes']:
+            base[key] = c
+    for c in configs:
+        b = base[(c['label'], c['time_steps'])]
+        c['speedup'] = b['total_time']['mean'] / c['total_time']['mean'] if c['total_time']['mean'] else 0.0
+        c['efficiency'] = c['speedup'] / (c['processes'] / b['processes'])
+    return configs
+
+def print_report(configs, confidence=0.95):
+    """Text tables of the scaling and variance statistics."""
+    width = max([len(c['label']) for c in configs] + [5])
+    print(f"{'label':<{width}} {'T':>5} {'procs':>6} {'MxN':>8} {'n':>3} {'total':>9} "
+          f"{str(int(confidence * 100)) + '% CI':<17} {'cv':>6} {'speedup':>8} {'eff':>6} {'read%':>6} {'write%':>7}")
+    for c in configs:
+        t = c['total_time']
+        ci = f"[{t['ci_low']:.2f}, {t['ci_high']:.2f}]"
+        print(f"{c['label']:<{width}} {c['time_steps']:>5} {c['processes']:>6} {c['M']:>4}x{c['N']:<3} {t['n']:>3} "
+              f"{t['mean']:>9.2f} {ci:<17} {t['cv']:>6.1%} {c['speedup']:>8.2f} {c['efficiency']:>6.1%} "
+              f"{c['read_share']:>6.1%} {c['write_share']:>7.1%}")
+
+    print("\nOutlying trials (IQR fences / MAD z-score):")
+    found = False
+    for c in configs:
+        for metric in METRICS:
+            iqr, mad = ([c['trials'][i] for i in c[metric]['outliers'][rule]] for rule in ('iqr', 'mad'))
+            if iqr or mad:
+                found = True
+                print(f"  {c['label']} procs={c['processes']} {metric}: IQR trials {iqr}, MAD trials {mad}")
+    if not found:
+        print("  none")
+
+def permutation_pvalue(baseline, candidate, permutations=10000, seed=0):
+    """
+    One-sided permutation test p-value of the candidate mean exceeding the baseline mean.
+    All relabelings are enumerated when there are at most `permutations` of them,
+    otherwise `permutations` random relabelings are drawn.
+    """
+    pooled = list(baseline) + list(candidate)
+    n, k = len(pooled), len(candidate)
+    total = sum(pooled)
+    observed = statistics.fmean(candidate) - statistics.fmean(baseline)
+
+    def diff(cand_sum):
+        return cand_sum / k - (total - cand_sum) / (n - k)
+
+    tol = 1e-12 * max(abs(total), 1.0)
+    if math.comb(n, k) <= permutations:
+        sums = [sum(pooled[i] for i in idx) for idx in combinations(range(n), k)]
+        return sum(diff(s) >= observed - tol for s in sums) / len(sums)
+    rng = random.Random(seed)
+    hits = sum(diff(sum(rng.sample(pooled, k))) >= observed - tol for _ in range(permutations))
+    return (hits + 1) / (permutations + 1)
+
+# Trials per side for which the permutation test can reach p < 0.05 (1/C(8, 4) = 1/70)
+MIN_GATE_TRIALS = 4
+
+def min_pvalue(n_baseline, n_candidate, permutations=10000):
+    """Smallest p-value permutation_pvalue can return for these sample sizes."""
+    relabelings = math.comb(n_baseline + n_candidate, n_candidate)
+    return 1 / relabelings if relabelings <= permutations else 1 / (permutations + 1)
+
+def regression_check(baseline_records, candidate_records, alpha=0.05, min_effect=0.05, permutations=10000):
+    """
+    Compare every timing the baseline and candidate share, configuration by configuration.
+    A timing regresses when the candidate is slower by more than min_effect (relative mean)
+    and a one-sided permutation test rejects "no slowdown" at level alpha. Only the read,
+    write and total times (METRICS) are gated: the per-phase timings are short and noisy,
+    and testing each of them at alpha would fail sweeps without any slowdown, so they are
+    compared for information only. With too few trials the test cannot reach alpha
+    (e.g. 3 vs 3 trials give p >= 1/20); such gated comparisons are marked 'underpowered'.
+
+    Returns:
+        List of comparison dicts, with 'regression' True for the significant slowdowns
+    """
+    baseline, candidate = group_records(baseline_records), group_records(candidate_records)
+    comparisons = []
+    for key in sorted(set(baseline) & set(candidate)):
+        label, time_steps, processes, M, N = key
+        metrics = sorted(set.intersection(*(set(r) for r in baseline[key] + candidate[key])) - set(RECORD_KEYS))
+        for metric in metrics:
+            b = [r[metric] for r in baseline[key]]
+            c = [r[metric] for r in candidate[key]]
+            b_mean, c_mean = statistics.fmean(b), statistics.fmean(c)
+            effect = c_mean / b_mean - 1.0 if b_mean > 0 else 0.0
+            pvalue = permutation_pvalue(b, c, permutations) if len(b) > 1 and len(c) > 1 else 1.0
+            gated = metric in METRICS
+            slower = effect > min_effect and pvalue < alpha
+            underpowered = gated and (len(b) < 2 or len(c) < 2 or min_pvalue(len(b), len(c), permutations) >= alpha)
+            comparisons.append({'label': label, 'time_steps': time_steps, 'processes': processes, 'M': M, 'N': N,
+                                'metric': metric, 'baseline_mean': b_mean, 'candidate_mean': c_mean,
+                                'baseline_n': len(b), 'candidate_n': len(c), 'effect': effect, 'pvalue': pvalue,
+                                'gated': gated, 'slower': slower, 'regression': gated and slower,
+                                'underpowered': underpowered})
+    return comparisons
+
+def print_regressions(comparisons, alpha, min_effect):
+    """Text table of the baseline comparison; returns the number of regressions."""
+    if not comparisons:
+        print("No configuration in common with the baseline")
+        return 0
+    width = max(len(c['label']) for c in comparisons)
+    print(f"\nRegression check (slower by > {min_effect:.0%} with one-sided permutation p < {alpha}):")
+    print(f"{'label':<{width}} {'procs':>6} {'metric':<16} {'baseline':>9} {'candidate':>10} {'change':>8} {'p':>7}")
+    for c in comparisons:
+        flag = '  REGRESSION' if c['regression'] else ('  slower (phase, not gated)' if c['slower'] else '')
+        print(f"{c['label']:<{width}} {c['processes']:>6} {c['metric']:<16} {c['baseline_mean']:>9.2f} "
+              f"{c['candidate_mean']:>10.2f} {c['effect']:>+8.1%} {c['pvalue']:>7.4f}{flag}")
+    regressions = sum(c['regression'] for c in comparisons)
+    gated = sum(c['gated'] for c in comparisons)
+    print(f"{regressions} significant slowdown(s) in {gated} gated comparisons ({', '.join(METRICS)}); "
+          f"{len(comparisons) - gated} phase comparisons are informational")
+    underpowered = [c for c in comparisons if c['underpowered']]
+    if underpowered:
+        sizes = sorted({(c['baseline_n'], c['candidate_n']) for c in underpowered})
+        print(f"Warning: {len(underpowered)} comparison(s) cannot reach p < {alpha} with "
+              f"{', '.join(f'{b} vs {c}' for b, c in sizes)} trials; slowdowns there go undetected "
+              f"(use at least {MIN_GATE_TRIALS} trials per side, or a larger --alpha)")
+    return regressions
+
+def load_all(paths):
+    """Records of several results files, reporting what was loaded from each."""
+    records = []
+    for path in paths:
+        loaded, skipped = load_results(path)
+        records += loaded
+        print(f"{path}: {len(loaded)} trials" + (f", {skipped} rows without timings skipped" if skipped else ""))
+    return records
+
+def plot_report(configs, plot_dir):
+    """Save the scaling, efficiency and phase-share plots as PNG files (needs matplotlib)."""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is required for --plot_dir")
+        sys.exit(1)
+    os.makedirs(plot_dir, exist_ok=True)
+
+    curves = defaultdict(list)
+    for c in configs:
+        curves[(c['label'], c['time_steps'])].append(c)
+
+    fig, (ax_time, ax_eff) = plt.subplots(1, 2, figsize=(12, 5))
+    for (label, time_steps), curve in curves.items():
+        procs = [c['processes'] for c in curve]
+        means = [c['total_time']['mean'] for c in curve]
+        errs = [c['total_time']['mean'] - c['total_time']['ci_low'] for c in curve]
+        ax_time.errorbar(procs, means, yerr=errs, marker='o', capsize=3, label=f'{label} (T={time_steps})')
+        ax_eff.plot(procs, [c['efficiency'] for c in curve], marker='o', label=f'{label} (T={time_steps})')
+    ax_time.set(xscale='log', yscale='log', xlabel='MPI processes', ylabel='total time (s)', title='Strong scaling')
+    ax_eff.set(xscale='log', xlabel='MPI processes', ylabel='parallel efficiency', title='Efficiency')
+    ax_time.legend(fontsize='small')
+    fig.tight_layout()
+    fig.savefig(os.path.join(plot_dir, 'scaling.png'), dpi=150)
+    plt.close(fig)
+
+    fig, ax = plt.subplots(figsize=(12, 5))
+    names = [f"{c['label']}\n{c['processes']}" for c in configs]
+    reads = [c['read_time']['mean'] for c in configs]
+    writes = [c['write_time']['mean'] for c in configs]
+    others = [max(c['total_time']['mean'] - r - w, 0.0) for c, r, w in zip(configs, reads, writes)]
+    ax.bar(names, reads, label='read')
+    ax.bar(names, writes, bottom=reads, label='write')
+    ax.bar(names, others, bottom=[r + w for r, w in zip(reads, writes)], label='other')
+    ax.set(ylabel='mean time (s)', title='Phase breakdown')
+    ax.tick_params(axis='x', labelsize='x-small', rotation=90)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(os.path.join(plot_dir, 'phases.png'), dpi=150)
+    plt.close(fig)
+    print(f"Plots saved in {plot_dir}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scaling, efficiency and variance analysis of NA forcing benchmark results")
+    parser.add_argument('results', nargs='+', help="benchmark.sh CSVs, benchmark.py CSVs or benchmark.py JSON results")
+    parser.add_argument('--confidence', type=float, default=0.95, help="confidence level of the t intervals")
+    parser.add_argument('--json', default=None, help="write the analysis as JSON")
+    parser.add_argument('--plot_dir', default=None, help="save scaling and phase plots here (needs matplotlib)")
+    parser.add_argument('--baseline', nargs='+', default=None,
+                        help="baseline results; exit with status 1 if the results are significantly slower")
+    parser.add_argument('--alpha', type=float, default=0.05, help="significance level of the regression test")
+    parser.add_argument('--min_effect', type=float, default=0.05,
+                        help="relative slowdown below which a change is never reported as a regression")
+    parser.add_argument('--permutations', type=int, default=10000, help="permutations of the regression test")
+    args = parser.parse_args()
+
+    records = load_all(args.results)
+    if not records:
+        print("No trials to analyze")
+        sys.exit(1)
+
+    configs = analyze(records, args.confidence)
+    print()
+    print_report(configs, args.confidence)
+
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump({'confidence': args.confidence, 'configs': configs}, fh, indent=2)
+    if args.plot_dir:
+        plot_report(configs, args.plot_dir)
+
+    if args.baseline:
+        comparisons = regression_check(load_all(args.baseline), records, args.alpha, args.min_effect, args.permutations)
+        if print_regressions(comparisons, args.alpha, args.min_effect):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
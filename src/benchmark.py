@@ -0,0 +1,225 @@
+# Benchmark driver for the NA forcing conversion scripts
+# Sweeps an M x N x I/O strategy x time steps grid with mpiexec and collects the scripts' timing JSON
+# into a results file, together with the environment metadata needed to reproduce the study
+
+import os, sys
+import argparse
+import csv
+import itertools
+import json
+import platform
+import shlex
+import socket
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+from analyze_benchmark import load_all, load_results, regression_check, print_regressions, MIN_GATE_TRIALS
+
+# Version of the results file layout, bumped whenever a field changes meaning
+RESULTS_SCHEMA = 'na_forcinggen.benchmark/1'
+
+# Flat columns of the CSV results file
+CSV_FIELDS = ['script', 'io_strategy', 'M', 'N', 'processes', 'time_steps', 'trial', 'status',
+              'read_time', 'write_time', 'total_time', 'read_gbps', 'write_gbps', 'bound', 'elapsed']
+
+# Environment variables carrying MPI-IO/PnetCDF hints into the runs
+HINT_VARIABLES = ('PNETCDF_HINTS', 'ROMIO_HINTS', 'MPICH_MPIIO_HINTS', 'OMPI_MCA_io', 'OMPI_MCA_fs_ufs_lock_algorithm')
+
+# Probe run with the benchmarked Python to record the MPI and PnetCDF library versions
+VERSION_PROBE = """
+import json
+info = {}
+try:
+    import mpi4py
+    from mpi4py import MPI
+    info['mpi4py'] = mpi4py.__version__
+    info['mpi_library'] = MPI.Get_library_version().strip()
+    info['mpi_standard'] = '%d.%d' % MPI.Get_version()
+except Exception as e:
+    info['mpi4py'] = 'unavailable: %s' % e
+try:
+    import pnetcdf
+    info['pnetcdf_python'] = getattr(pnetcdf, '__version__', 'unknown')
+    info['pnetcdf_library'] = pnetcdf.libver() if hasattr(pnetcdf, 'libver') else 'unknown'
+except Exception as e:
+    info['pnetcdf_python'] = 'unavailable: %s' % e
+try:
+    import numpy
+    info['numpy'] = numpy.__version__
+except Exception as e:
+    info['numpy'] = 'unavailable: %s' % e
+print(json.dumps(info))
+"""
+
+def command_output(cmd):
+    """First line of a command's output, or None if it cannot be run."""
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    lines = (out.stdout or out.stderr).strip().splitlines()
+    return lines[0] if lines else None
+
+def read_hostfile(hostfile):
+    """Host entries of an MPICH/Open MPI hostfile, comments and blank lines skipped."""
+    if not hostfile:
+        return [socket.gethostname()]
+    with open(hostfile) as fh:
+        return [line.split('#')[0].strip() for line in fh if line.split('#')[0].strip()]
+
+def environment_metadata(args):
+    """Hosts, MPI/PnetCDF versions, hints and source revision of the benchmark runs."""
+    try:
+        probe = json.loads(subprocess.run([args.python, '-c', VERSION_PROBE], capture_output=True,
+                                          text=True, timeout=120).stdout)
+    except (OSError, ValueError, subprocess.SubprocessError):
+        probe = {}
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'driver_host': socket.gethostname(),
+        'hosts': read_hostfile(args.hostfile),
+        'platform': platform.platform(),
+        'python': args.python,
+        'python_version': platform.python_version(),
+        'mpiexec': args.mpiexec,
+        'mpiexec_version': command_output([args.mpiexec, '--version']),
+        'git_revision': command_output(['git', '-C', src_dir, 'rev-parse', 'HEAD']),
+        'hints': {name: os.environ[name] for name in HINT_VARIABLES if name in os.environ},
+        **probe,
+    }
+
+def build_command(args, script, M, N, strategy, time_steps, timing_json):
+    """mpiexec command line of one run."""
+    cmd = [args.mpiexec]
+    if args.hostfile:
+        cmd += [args.hostfile_flag, args.hostfile]
+    cmd += ['-n', str(M * N), args.python, script, args.input_path, args.output_path, str(time_steps), str(M), str(N),
+            '--timing_json', timing_json]
+    if strategy is not None:
+        cmd += ['--io_strategy', strategy]
+    return cmd + shlex.split(args.script_args)
+
+def summarize(report):
+    """Headline numbers of a timing report: slowest-rank phase times and aggregate bandwidth."""
+    world, bandwidth = report['world'], report['bandwidth']['world']
+    return {'read_time': world['read']['max'], 'write_time': world['write']['max'],
+            'total_time': world['total']['max'], 'read_gbps': bandwidth['read']['gbps'],
+            'write_gbps': bandwidth['write']['gbps'], 'bound': report['bound']['world']}
+
+def run_one(args, script, M, N, strategy, time_steps, trial, log_dir):
+    """Run one configuration once; returns its result record, with status 'failed' on any error."""
+    result = {'script': os.path.basename(script), 'io_strategy': strategy or 'default', 'M': M, 'N': N,
+              'processes': M * N, 'time_steps': time_steps, 'trial': trial}
+    fd, timing_json = tempfile.mkstemp(prefix='timing_', suffix='.json', dir=log_dir)
+    os.close(fd)
+    os.remove(timing_json)
+    cmd = build_command(args, script, M, N, strategy, time_steps, timing_json)
+    log_path = os.path.join(log_dir, f"{result['script']}.{result['io_strategy']}.M{M}.N{N}.T{time_steps}.{trial}.log")
+    result.update({'command': ' '.join(shlex.quote(c) for c in cmd), 'log': log_path})
+
+    start = time.time()
+    try:
+        with open(log_path, 'w') as log:
+            proc = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT, timeout=args.timeout)
+        result['returncode'] = proc.returncode
+    except subprocess.TimeoutExpired:
+        result['returncode'] = None
+        result['error'] = f'timed out after {args.timeout}s'
+    result['elapsed'] = time.time() - start
+
+    if result['returncode'] == 0 and os.path.exists(timing_json):
+        with open(timing_json) as fh:
+            report = json.load(fh)
+        os.remove(timing_json)
+        result.update(summarize(report), status='ok', timing=report)
+    else:
+        result['status'] = 'failed'
+        result.setdefault('error', f"exit code {result['returncode']}, no timing report (see {log_path})")
+    return result
+
+def write_results(path, environment, sweep, runs):
+    """Write the JSON results file."""
+    with open(path, 'w') as fh:
+        json.dump({'schema': RESULTS_SCHEMA, 'environment': environment, 'sweep': sweep, 'runs': runs}, fh, indent=2)
+
+def write_results_csv(path, runs):
+    """Write the flat CSV view of the runs."""
+    with open(path, 'w', newline='') as fh:
+        writer = csv.DictWriter(fh, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(runs)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sweep the NA forcing conversion over M x N x I/O strategy x time steps and collect structured timings")
+    parser.add_argument('input_path', help="path to the 2D source data directory")
+    parser.add_argument('output_path', help="path for the 1D forcing data directory")
+    parser.add_argument('--scripts', nargs='+', default=['NA_forcingGEN_pnetcdf_engine.py'],
+                        help="conversion scripts to benchmark (relative to this directory or absolute)")
+    parser.add_argument('--M', type=int, nargs='+', default=[1], help="processes per file to sweep")
+    parser.add_argument('--N', type=int, nargs='+', default=[1], help="files processed simultaneously to sweep")
+    parser.add_argument('--io_strategies', nargs='+', default=[None],
+                        help="I/O strategies to sweep (default: each script's own default)")
+    parser.add_argument('--time_steps', type=int, nargs='+', default=[-1], help="time steps to sweep (-1 for all)")
+    parser.add_argument('--repeat', type=int, default=None,
+                        help=f"trials per configuration (default 3, or {MIN_GATE_TRIALS} with --baseline so the regression gate can fire)")
+    parser.add_argument('--sleep', type=float, default=0, help="seconds to sleep between runs")
+    parser.add_argument('--timeout', type=float, default=None, help="seconds before a run is killed and recorded as failed")
+    parser.add_argument('--mpiexec', default='mpiexec', help="MPI launcher")
+    parser.add_argument('--hostfile', default=None, help="hostfile for multi-node runs")
+    parser.add_argument('--hostfile_flag', default='-f', help="launcher flag taking the hostfile (-f for MPICH, --hostfile for Open MPI)")
+    parser.add_argument('--python', default=sys.executable, help="Python interpreter the ranks run")
+    parser.add_argument('--script_args', default='', help="extra options passed to every run, e.g. \"--read_mode varn\"")
+    parser.add_argument('--results', default='benchmark_results.json', help="JSON results file")
+    parser.add_argument('--csv', default=None, help="also write a flat CSV view of the results")
+    parser.add_argument('--log_dir', default='benchmark_logs', help="directory of the per-run output logs")
+    parser.add_argument('--baseline', nargs='+', default=None,
+                        help="baseline results to compare against; exit with status 1 on significant slowdowns")
+    parser.add_argument('--alpha', type=float, default=0.05, help="significance level of the regression test")
+    parser.add_argument('--min_effect', type=float, default=0.05,
+                        help="relative slowdown below which a change is never reported as a regression")
+    args = parser.parse_args()
+    if args.repeat is None:
+        args.repeat = MIN_GATE_TRIALS if args.baseline else 3
+
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    scripts = [s if os.path.isabs(s) else os.path.join(src_dir, s) for s in args.scripts]
+    os.makedirs(args.log_dir, exist_ok=True)
+
+    environment = environment_metadata(args)
+    sweep = {'scripts': args.scripts, 'M': args.M, 'N': args.N, 'io_strategies': args.io_strategies,
+             'time_steps': args.time_steps, 'repeat': args.repeat, 'script_args': args.script_args}
+
+    runs = []
+    grid = list(itertools.product(scripts, args.M, args.N, args.io_strategies, args.time_steps))
+    for script, M, N, strategy, time_steps in grid:
+        for trial in range(1, args.repeat + 1):
+            print(f"Running {os.path.basename(script)} ({strategy or 'default'}) with M={M} N={N} T={time_steps} (trial {trial})")
+            result = run_one(args, script, M, N, strategy, time_steps, trial, args.log_dir)
+            runs.append(result)
+            if result['status'] != 'ok':
+                print(f"Warning: run failed: {result['error']}")
+
+            # Rewrite the results after every run, so an interrupted sweep keeps what it measured
+            write_results(args.results, environment, sweep, runs)
+            if args.csv:
+                write_results_csv(args.csv, runs)
+
+            if args.sleep:
+                time.sleep(args.sleep)
+
+    failed = sum(r['status'] != 'ok' for r in runs)
+    print(f"{len(runs) - failed} of {len(runs)} runs succeeded, results in {args.results}")
+
+    # Guard the read/extract/write path against slowdowns relative to a stored run
+    if args.baseline:
+        candidate, _ = load_results(args.results)
+        comparisons = regression_check(load_all(args.baseline), candidate, args.alpha, args.min_effect)
+        if print_regressions(comparisons, args.alpha, args.min_effect):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
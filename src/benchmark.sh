@@ -1,10 +1,22 @@
 #!/bin/bash
+# Thin wrapper around benchmark.py, which sweeps the grid, launches mpiexec and
+# collects the scripts' structured timing output (no more grepping stdout)
+
+# === CONFIG ===
+CONDA_ENV="elm"
+INPUT_PATH="/home/exouser/shared_data/final_project/dataset"
+OUTPUT_PATH="/home/exouser/shared_data/final_project/output"
+HOSTFILE_PATH="/home/exouser/shared_data/final_project/src/hostfile.txt"
+SCRIPT_PATH="/home/exouser/shared_data/final_project/src/"
 
 # === Parameters ===
 FILES=("NA_forcingGEN_pnetcdf_collective_block_time.py" "NA_forcingGEN_pnetcdf_independent_unblock_time.py")
 # FILES=("NA_forcingGEN_pnetcdf_independent_unblock_time.py")
 
-NUM_PROCESSES=(8 16 32 64)
+NUM_PROCESSES=(8 16 32 64)   # M, processes per file
+NUM_FILES=(1)                # N, files in parallel
+IO_STRATEGIES=()             # empty: each script's default, e.g. (blocking_collective buffered_bput)
+TIME_STEPS=(-1)
 MULTI=0  # 0 for single node
 
 # NUM_PROCESSES=(128)
@@ -13,43 +25,24 @@ MULTI=0  # 0 for single node
 REPEAT=8
 SLEEP_TIME=10   # Seconds to sleep between runs
 
-# === Output log ===
-# CSVFILE="benchmark_results.csv"
-CSVFILE="benchmark_results_multiple.csv"
-echo "File,Processes,Trial,ReadTime,WriteTime,TotalTime" > $CSVFILE
-
-# === Main loop ===
-for FILE in "${FILES[@]}"; do
-    for PROCS in "${NUM_PROCESSES[@]}"; do
-        for ((i=1; i<=$REPEAT; i++)); do
-            echo "Running $FILE with $PROCS processes (trial $i)"
-            
-            # Run your script and capture output
-            ./run.sh $FILE $PROCS 1 -1 $MULTI > tmp_output.txt 2>&1
-
-            # Extract relevant lines
-            read_line=$(grep "Read time" tmp_output.txt)
-            total_line=$(grep "Group 0: Processing" tmp_output.txt)
-
-            # Parse the times
-            if [[ $read_line && $total_line ]]; then
-                # Extract read time
-                read_time=$(echo $read_line | sed -n 's/.*Read time = \([0-9.]*\)s.*/\1/p')
-                
-                # Extract write time
-                write_time=$(echo $read_line | sed -n 's/.*Write time = \([0-9.]*\)s.*/\1/p')
-                
-                # Extract total processing time
-                total_time=$(echo $total_line | sed -n 's/.*took \([0-9.]*\) seconds.*/\1/p')
-                
-                # Append to CSV
-                echo "$FILE,$PROCS,$i,$read_time,$write_time,$total_time" >> $CSVFILE
-            else
-                echo "Warning: Missing output for $FILE with $PROCS processes on trial $i" >> $CSVFILE
-            fi
-
-            # Sleep between runs
-            sleep $SLEEP_TIME
-        done
-    done
-done
+# === Output ===
+# A fresh name per sweep, so the legacy benchmark_results*.csv files are never overwritten
+if [ "$MULTI" -eq 1 ]; then NODES="multi"; else NODES="single"; fi
+RESULTS="benchmark_sweep_${NODES}_$(date +%Y%m%d-%H%M%S)"
+
+# === Conda setup ===
+source "$(conda info --base)/etc/profile.d/conda.sh"
+conda activate "$CONDA_ENV"
+
+EXTRA=()
+if [ "$MULTI" -eq 1 ]; then
+    EXTRA+=(--hostfile "$HOSTFILE_PATH")
+fi
+if [ "${#IO_STRATEGIES[@]}" -gt 0 ]; then
+    EXTRA+=(--io_strategies "${IO_STRATEGIES[@]}")
+fi
+
+python "${SCRIPT_PATH}benchmark.py" "$INPUT_PATH" "$OUTPUT_PATH" \
+    --scripts "${FILES[@]}" --M "${NUM_PROCESSES[@]}" --N "${NUM_FILES[@]}" --time_steps "${TIME_STEPS[@]}" \
+    --repeat $REPEAT --sleep $SLEEP_TIME --python "$(which python)" \
+    --results "$RESULTS.json" --csv "$RESULTS.csv" "${EXTRA[@]}" "$@"
@@ -0,0 +1,203 @@
+# Synthetic Daymet-like forcing generator for local scaling benchmarks
+# Writes CDF-5 clmforc.Daymet4.1km.<VAR>.<YYYY-MM>.nc files with PnetCDF from all MPI ranks,
+# splitting each file along the time dimension like the conversion scripts
+
+import os, sys
+import argparse
+import numpy as np
+from datetime import datetime
+
+try:
+    from mpi4py import MPI
+    HAS_MPI4PY = True
+except ImportError:
+    HAS_MPI4PY = False
+    print("mpi4py is required for this script")
+    sys.exit(1)
+
+try:
+    import pnetcdf as pnc
+    HAS_PNETCDF = True
+except ImportError:
+    HAS_PNETCDF = False
+    print("pnetcdf-python is required for this script")
+    sys.exit(1)
+
+# Days per month of the 365-day (noleap) calendar of the Daymet forcing
+MONTH_DAYS = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+
+# Per-variable long name, units, base value, amplitude of the diurnal cycle and lower bound
+VARIABLES = {
+    'FSDS': ('incident shortwave radiation', 'W/m**2', 150.0, 300.0, 0.0),
+    'FLDS': ('incident longwave radiation', 'W/m**2', 300.0, 30.0, 0.0),
+    'PRECTmms': ('precipitation', 'mm/s', 2.0e-5, 4.0e-5, 0.0),
+    'PSRF': ('surface pressure at the lowest atm level', 'Pa', 95000.0, 500.0, 0.0),
+    'QBOT': ('specific humidity at the lowest atm level', 'kg/kg', 0.006, 0.002, 0.0),
+    'TBOT': ('temperature at the lowest atm level', 'K', 280.0, 8.0, 0.0),
+    'WIND': ('wind at the lowest atm level', 'm/s', 4.0, 2.0, 0.0),
+}
+
+# Land/ocean mask shapes
+MASK_SHAPES = ('ellipse', 'random', 'all')
+
+def land_mask(ny, nx, shape='ellipse', land_fraction=0.5, seed=0):
+    """
+    Boolean [y, x] land mask with about land_fraction land cells. Every rank
+    computes the same mask from the seed, so no communication is needed.
+
+    Args:
+        ny, nx: Grid size
+        shape: 'ellipse' (a continent with a noisy coastline), 'random' (independent cells) or 'all' (no ocean)
+        land_fraction: Fraction of land cells for 'ellipse' and 'random'
+        seed: Random seed
+    Returns:
+        Boolean array, True over land
+    """
+    if shape == 'all':
+        return np.ones((ny, nx), dtype=bool)
+    rng = np.random.default_rng(seed)
+    if shape == 'random':
+        return rng.random((ny, nx)) < land_fraction
+
+    # Distance from the grid center in units of the half axes, roughened for a coastline;
+    # the land_fraction quantile of the score sets the coast so the fraction is met exactly
+    yy, xx = np.meshgrid(np.linspace(-1, 1, ny), np.linspace(-1, 1, nx), indexing='ij')
+    score = np.hypot(xx, yy) + 0.15 * rng.standard_normal((ny, nx))
+    return score <= np.quantile(score, land_fraction)
+
+def month_periods(start, months):
+    """'YYYY-MM' periods of months consecutive months from start."""
+    year, month = (int(v) for v in start.split('-'))
+    periods = []
+    for _ in range(months):
+        periods.append(f'{year:04d}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+def period_times(period, ref_year, steps_per_day):
+    """Time values (days since ref_year-01-01, noleap calendar) at the middle of each step of period."""
+    year, month = (int(v) for v in period.split('-'))
+    first_day = (year - ref_year) * 365 + sum(MONTH_DAYS[:month - 1])
+    steps = MONTH_DAYS[month - 1] * steps_per_day
+    return first_day + (np.arange(steps) + 0.5) / steps_per_day
+
+def synthetic_field(var_name, times, mask):
+    """
+    [time, y, x] float32 values of var_name at times: a diurnal cycle shifted
+    across x plus a north-south gradient, NaN over the ocean.
+    """
+    _, _, base, amplitude, lower = VARIABLES.get(var_name, (var_name, '1', 1.0, 0.5, 0.0))
+    ny, nx = mask.shape
+    phase = np.linspace(0, 0.25, nx, dtype=np.float32)[None, None, :]
+    gradient = np.linspace(-0.5, 0.5, ny, dtype=np.float32)[None, :, None]
+    day_frac = (times % 1.0).astype(np.float32)[:, None, None]
+    data = base + amplitude * (np.sin(2 * np.pi * (day_frac + phase)) + gradient)
+    data = np.maximum(data, lower).astype(np.float32)
+    data[:, ~mask] = np.nan
+    return data
+
+def write_forcing_file(path, var_name, period, x, y, mask, args, comm):
+    """Write one source file; each rank writes a contiguous block of time steps."""
+    rank, size = comm.Get_rank(), comm.Get_size()
+    ref_year = args.ref_year if args.ref_year is not None else int(period.split('-')[0])
+    times = period_times(period, ref_year, args.steps_per_day)
+    total_time = times.size
+
+    # Calculate time slice for each process
+    base_time_per_process = total_time // size
+    time_remainder = total_time % size
+    if rank < time_remainder:
+        local_start_time = rank * (base_time_per_process + 1)
+        local_count_time = base_time_per_process + 1
+    else:
+        local_start_time = rank * base_time_per_process + time_remainder
+        local_count_time = base_time_per_process
+
+    dst = pnc.File(filename=path, mode='w', format='NC_64BIT_DATA', comm=comm)
+    dst.put_att('title', f'Synthetic Daymet-like {var_name} ({period}) for benchmarking')
+    dst.def_dim('time', total_time)
+    dst.def_dim('y', y.size)
+    dst.def_dim('x', x.size)
+
+    var_x = dst.def_var('x', pnc.NC_FLOAT, ['x'])
+    var_y = dst.def_var('y', pnc.NC_FLOAT, ['y'])
+    var_time = dst.def_var('time', pnc.NC_FLOAT, ['time'])
+    var_main = dst.def_var(var_name, pnc.NC_FLOAT, ['time', 'y', 'x'])
+
+    var_x.put_att('units', 'm')
+    var_x.put_att('long_name', 'x coordinate of projection')
+    var_y.put_att('units', 'm')
+    var_y.put_att('long_name', 'y coordinate of projection')
+    var_time.put_att('units', f'days since {ref_year:04d}-01-01 00:00:00')
+    var_time.put_att('calendar', 'noleap')
+    var_time.put_att('long_name', 'time')
+    long_name, units = VARIABLES.get(var_name, (var_name, '1'))[:2]
+    var_main.put_att('long_name', long_name)
+    var_main.put_att('units', units)
+    var_main.put_att('_FillValue', np.float32(np.nan))
+    dst.enddef()
+
+    # Coordinates are written by rank 0, the other processes join with empty requests
+    n = 1 if rank == 0 else 0
+    var_x.put_var_all(start=[0], count=[x.size * n], data=x[:x.size * n])
+    var_y.put_var_all(start=[0], count=[y.size * n], data=y[:y.size * n])
+    var_time.put_var_all(start=[local_start_time], count=[local_count_time],
+                         data=times[local_start_time:local_start_time + local_count_time].astype(np.float32))
+
+    # Write the time slice in chunks of chunk_steps; every rank makes the same number of collective calls
+    n_chunks = comm.allreduce(-(-local_count_time // args.chunk_steps), op=MPI.MAX)
+    for k in range(n_chunks):
+        chunk_start = local_start_time + min(k * args.chunk_steps, local_count_time)
+        chunk_count = min(args.chunk_steps, local_start_time + local_count_time - chunk_start)
+        data = synthetic_field(var_name, times[chunk_start:chunk_start + chunk_count], mask)
+        var_main.put_var_all(start=[chunk_start, 0, 0], count=[chunk_count, y.size, x.size], data=data)
+
+    dst.close()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic Daymet-like CDF-5 forcing files with PnetCDF for local benchmarks")
+    parser.add_argument('output_path', help="directory of the generated clmforc.Daymet4.1km.<VAR>.<YYYY-MM>.nc files")
+    parser.add_argument('--variables', nargs='+', default=['TBOT', 'PRECTmms'],
+                        help=f"variables to generate (known: {', '.join(VARIABLES)})")
+    parser.add_argument('--start', default='2014-01', help="first period, YYYY-MM")
+    parser.add_argument('--months', type=int, default=1, help="number of monthly files per variable")
+    parser.add_argument('--nx', type=int, default=400, help="grid size along x")
+    parser.add_argument('--ny', type=int, default=300, help="grid size along y")
+    parser.add_argument('--resolution', type=float, default=1000.0, help="grid spacing in m")
+    parser.add_argument('--x0', type=float, default=-2000000.0, help="x of the first (westmost) column in m")
+    parser.add_argument('--y0', type=float, default=1500000.0, help="y of the first (northmost) row in m")
+    parser.add_argument('--steps_per_day', type=int, default=8, help="time steps per day (8 is 3-hourly)")
+    parser.add_argument('--ref_year', type=int, default=None,
+                        help="reference year of the 'days since' time unit (default: the year of each file)")
+    parser.add_argument('--mask', choices=MASK_SHAPES, default='ellipse', help="land/ocean mask shape")
+    parser.add_argument('--land_fraction', type=float, default=0.5, help="fraction of land cells")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the mask")
+    parser.add_argument('--chunk_steps', type=int, default=8, help="time steps written per collective call")
+    args = parser.parse_args()
+
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    if rank == 0:
+        os.makedirs(args.output_path, exist_ok=True)
+    comm.Barrier()
+
+    # Projected coordinates, with y decreasing so gridID #0 is the upper left corner
+    x = (args.x0 + args.resolution * np.arange(args.nx)).astype(np.float32)
+    y = (args.y0 - args.resolution * np.arange(args.ny)).astype(np.float32)
+    mask = land_mask(args.ny, args.nx, args.mask, args.land_fraction, args.seed)
+
+    for period in month_periods(args.start, args.months):
+        for var_name in args.variables:
+            path = os.path.join(args.output_path, f'clmforc.Daymet4.1km.{var_name}.{period}.nc')
+            start_time = MPI.Wtime()
+            write_forcing_file(path, var_name, period, x, y, mask, args, comm)
+            if rank == 0:
+                print(f"Wrote {path} in {MPI.Wtime() - start_time:.2f} seconds")
+
+    if rank == 0:
+        print(f"Land cells: {int(mask.sum())} of {mask.size} ({mask.mean():.1%}), "
+              f"generated on {datetime.now().strftime('%m-%d-%Y')}")
+
+if __name__ == '__main__':
+    main()
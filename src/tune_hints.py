@@ -0,0 +1,127 @@
+# MPI-IO/PnetCDF hint tuner for the NA forcing conversion
+# Sweeps hint combinations on a sample file with the benchmark driver's runner and records the
+# fastest setting per cluster in a JSON hints file, read back by the engine with --hints_file
+
+import os, sys
+import argparse
+import itertools
+import json
+import shlex
+import statistics
+import tempfile
+from datetime import datetime
+
+from benchmark import run_one, environment_metadata
+from NA_forcingGEN_hints import default_cluster
+
+# Hint values swept by default; 'default' leaves the hint unset
+DEFAULT_GRID = {
+    'cb_buffer_size': ['default', '16777216', '67108864'],
+    'romio_cb_read': ['default', 'enable'],
+    'romio_cb_write': ['default', 'enable'],
+    'romio_ds_read': ['default', 'disable'],
+    'nc_var_align_size': ['default', '1048576'],
+}
+
+def parse_grid(specs):
+    """Sweep grid of 'key=v1,v2,...' specs, replacing DEFAULT_GRID when given."""
+    if not specs:
+        return dict(DEFAULT_GRID)
+    grid = {}
+    for spec in specs:
+        key, sep, values = spec.partition('=')
+        if not sep or not values:
+            raise ValueError(f"Grid entry '{spec}' is not of the form key=v1,v2,...")
+        grid[key.strip()] = [v.strip() for v in values.split(',')]
+    return grid
+
+def hint_combinations(grid):
+    """Every combination of the grid as a hints dict, unset ('default') hints left out."""
+    keys = list(grid)
+    for values in itertools.product(*(grid[k] for k in keys)):
+        yield {k: v for k, v in zip(keys, values) if v != 'default'}
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sweep MPI-IO/PnetCDF hint combinations on a sample file and record the fastest per cluster")
+    parser.add_argument('sample', help="sample clmforc.Daymet4.1km.<VAR>.<YYYY-MM>.nc source file")
+    parser.add_argument('output_path', help="scratch directory for the converted output")
+    parser.add_argument('--M', type=int, default=8, help="processes per file")
+    parser.add_argument('--N', type=int, default=1, help="files processed simultaneously")
+    parser.add_argument('--time_steps', type=int, default=-1, help="time steps to convert (-1 for all)")
+    parser.add_argument('--io_strategy', default=None, help="I/O strategy of the runs (default: the script's)")
+    parser.add_argument('--grid', nargs='+', default=None, metavar='KEY=V1,V2',
+                        help="hint values to sweep ('default' leaves a hint unset); replaces the built-in grid")
+    parser.add_argument('--repeat', type=int, default=3, help="trials per combination")
+    parser.add_argument('--cluster', default=None, help="cluster name of the record (default: host name without node digits)")
+    parser.add_argument('--hints_out', default='hints.json', help="JSON hints file the fastest setting is merged into")
+    parser.add_argument('--script', default='NA_forcingGEN_pnetcdf_engine.py', help="conversion script")
+    parser.add_argument('--script_args', default='', help="extra options passed to every run")
+    parser.add_argument('--timeout', type=float, default=None, help="seconds before a run is killed and recorded as failed")
+    parser.add_argument('--mpiexec', default='mpiexec', help="MPI launcher")
+    parser.add_argument('--hostfile', default=None, help="hostfile for multi-node runs")
+    parser.add_argument('--hostfile_flag', default='-f', help="launcher flag taking the hostfile (-f for MPICH, --hostfile for Open MPI)")
+    parser.add_argument('--python', default=sys.executable, help="Python interpreter the ranks run")
+    parser.add_argument('--log_dir', default='tune_logs', help="directory of the per-run output logs")
+    args = parser.parse_args()
+
+    cluster = args.cluster or default_cluster()
+    grid = parse_grid(args.grid)
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    script = args.script if os.path.isabs(args.script) else os.path.join(src_dir, args.script)
+    os.makedirs(args.log_dir, exist_ok=True)
+
+    # The engine converts a directory: expose the sample file alone in a scratch input directory
+    input_dir = tempfile.mkdtemp(prefix='tune_input_')
+    os.symlink(os.path.abspath(args.sample), os.path.join(input_dir, os.path.basename(args.sample)))
+    args.input_path = input_dir + '/'
+
+    base_args = args.script_args
+    results = []
+    for hints in hint_combinations(grid):
+        hint_args = ('--hints ' + ' '.join(shlex.quote(f'{k}={v}') for k, v in hints.items())) if hints else ''
+        args.script_args = f'{base_args} {hint_args}'.strip()
+        times = []
+        for trial in range(1, args.repeat + 1):
+            print(f"Hints {hints or '(none)'} (trial {trial})")
+            run = run_one(args, script, args.M, args.N, args.io_strategy, args.time_steps, trial, args.log_dir)
+            if run['status'] == 'ok':
+                times.append(run['total_time'])
+            else:
+                print(f"Warning: run failed: {run['error']}")
+        results.append({'hints': hints, 'times': times,
+                        'mean': statistics.fmean(times) if times else None,
+                        'median': statistics.median(times) if times else None})
+    os.remove(os.path.join(input_dir, os.path.basename(args.sample)))
+    os.rmdir(input_dir)
+
+    measured = [r for r in results if r['median'] is not None]
+    if not measured:
+        print("No hint combination ran successfully")
+        sys.exit(1)
+    # The median is robust to the occasional slow trial of a shared filesystem
+    best = min(measured, key=lambda r: r['median'])
+    default = next((r for r in measured if not r['hints']), None)
+    print(f"Fastest hints on {cluster}: {best['hints'] or '(none)'}, median total time {best['median']:.2f}s"
+          + (f" (no hints: {default['median']:.2f}s)" if default else ""))
+
+    # Merge the cluster's record into the hints file
+    data = {'clusters': {}}
+    if os.path.exists(args.hints_out):
+        with open(args.hints_out) as fh:
+            data = json.load(fh)
+        data.setdefault('clusters', {})
+    data['clusters'][cluster] = {
+        'hints': best['hints'], 'median_total_time': best['median'],
+        'default_median_total_time': default['median'] if default else None,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'sample': os.path.abspath(args.sample), 'M': args.M, 'N': args.N, 'time_steps': args.time_steps,
+        'io_strategy': args.io_strategy or 'default', 'environment': environment_metadata(args),
+        'sweep': results,
+    }
+    with open(args.hints_out, 'w') as fh:
+        json.dump(data, fh, indent=2)
+    print(f"Recorded in {args.hints_out}; use it with --hints_file {args.hints_out}")
+
+if __name__ == '__main__':
+    main()